@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+
+from . import passwords
+
+
+def user_key(user_id):
+    return f"user:{user_id}"
+
+
+def invalidate_user(user_id):
+    cache.delete(user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    # the user of every authenticated request is read from the cache, it is dropped whenever
+    # the user is saved or deleted so that a password change still ends the other sessions
+    def get_user(self, user_id):
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        # hashes in the bounded pool of authentication.passwords, when it is full every login form, the admin one
+        # included, answers as for a failed login and request.password_checks_busy tells the login view
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            return self.check_credentials(username, password)
+        except passwords.PasswordChecksBusy:
+            if request is not None:
+                request.password_checks_busy = True
+            raise PermissionDenied
+
+    def check_credentials(self, username, password):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            passwords.hash_unknown_password(password)
+            return None
+        if passwords.check_user_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
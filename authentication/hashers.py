@@ -0,0 +1,9 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    # same algorithm name as the default hasher, hashes of another work factor are rehashed on login
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+def fill_username_search(apps, schema_editor):
+    user_model = apps.get_model('authentication', 'User')
+    users = []
+    for user in user_model.objects.only('id', 'username').iterator(chunk_size=1000):
+        user.username_search = user.username.casefold()
+        users.append(user)
+        if len(users) == 1000:
+            user_model.objects.bulk_update(users, ['username_search'])
+            users = []
+    user_model.objects.bulk_update(users, ['username_search'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='username_search',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(fill_username_search, migrations.RunPython.noop),
+    ]
@@ -12,3 +12,12 @@ class User(AbstractUser):
     )
 
     role = models.CharField(max_length=30, choices=ROLE_CHOICES, verbose_name='Rôle')
+    # case-folded copy of the username, its index serves the prefix searches of the follow page
+    username_search = models.CharField(max_length=150, db_index=True, editable=False, default='')
+
+    def save(self, *args, **kwargs):
+        self.username_search = self.username.casefold()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'username' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'username_search'}
+        super().save(*args, **kwargs)
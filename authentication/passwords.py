@@ -0,0 +1,40 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+
+# hashing is CPU bound, at most PASSWORD_CHECK_WORKERS passwords are hashed at once whatever the number of
+# login requests, and requests beyond PASSWORD_CHECK_MAX_PENDING waiting checks are turned away
+executor = ThreadPoolExecutor(settings.PASSWORD_CHECK_WORKERS, thread_name_prefix="password-check")
+pending = threading.BoundedSemaphore(settings.PASSWORD_CHECK_MAX_PENDING)
+
+
+class PasswordChecksBusy(Exception):
+    pass
+
+
+def run(function, *args):
+    if not pending.acquire(blocking=False):
+        raise PasswordChecksBusy
+    try:
+        return executor.submit(function, *args).result()
+    finally:
+        pending.release()
+
+
+def check_user_password(user, password):
+    # only the hashing runs in the pool, the hash is upgraded to the preferred hasher and work factor
+    if not run(check_password, password, user.password):
+        return False
+    preferred = get_hasher()
+    hasher = identify_hasher(user.password)
+    if hasher.algorithm != preferred.algorithm or preferred.must_update(user.password):
+        user.password = run(make_password, password)
+        user.save(update_fields=["password"])
+    return True
+
+
+def hash_unknown_password(password):
+    # unknown users cost as much as known ones so that timing does not tell them apart
+    run(make_password, password)
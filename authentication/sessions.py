@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+
+class SessionStore(cached_db.SessionStore):
+    # cached_db caches every session until it expires whatever the TIMEOUT of the cache, its entries are kept
+    # at most SESSION_CACHE_TIMEOUT seconds here so that the other processes read a logout from the database
+    def get_cache_timeout(self, **kwargs):
+        return min(self.get_expiry_age(**kwargs), settings.SESSION_CACHE_TIMEOUT)
+
+    def load(self):
+        try:
+            data = self._cache.get(self.cache_key)
+        except Exception:
+            data = None
+        if data is None:
+            session = self._get_session_from_db()
+            if session:
+                data = self.decode(session.session_data)
+                self._cache.set(self.cache_key, data, self.get_cache_timeout(expiry=session.expire_date))
+            else:
+                data = {}
+        return data
+
+    def save(self, must_create=False):
+        DBStore.save(self, must_create)
+        self._cache.set(self.cache_key, self._session, self.get_cache_timeout())
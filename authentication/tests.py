@@ -0,0 +1,148 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import passwords, sessions, throttle
+from .models import User
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def test_session_and_user_are_read_from_the_caches(self):
+        etag = self.client.get(reverse("api-follows"))["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("api-follows"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changed_users_are_read_again(self):
+        self.client.get(reverse("api-follows"))
+        self.user.first_name = "Victor"
+        self.user.save()
+        # the user, then the timeline entries
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("home"))
+        self.assertEqual(response.context["user"].first_name, "Victor")
+
+    def test_password_change_ends_the_sessions(self):
+        self.client.get(reverse("api-follows"))
+        self.user.set_password("5678Aze!")
+        self.user.save()
+        self.assertEqual(self.client.get(reverse("api-follows")).status_code, 403)
+
+
+class SessionCacheTests(TestCase):
+    def setUp(self):
+        caches["sessions"].clear()
+
+    def cache_ttl(self, session):
+        # seconds left before the local memory entry of the session expires
+        session_cache = caches["sessions"]
+        return session_cache._expire_info[session_cache.make_key(session.cache_key)] - time.time()
+
+    @override_settings(SESSION_CACHE_TIMEOUT=60)
+    def test_saved_sessions_are_cached_session_cache_timeout_seconds(self):
+        session = sessions.SessionStore()
+        session["user"] = "reader"
+        session.save()
+        self.assertLessEqual(self.cache_ttl(session), 60)
+        self.assertEqual(session.get_expiry_age(), 60 * 60 * 24 * 14)
+
+    @override_settings(SESSION_CACHE_TIMEOUT=60)
+    def test_sessions_loaded_from_the_database_are_cached_session_cache_timeout_seconds(self):
+        session = sessions.SessionStore()
+        session["user"] = "reader"
+        session.save()
+        caches["sessions"].clear()
+        session = sessions.SessionStore(session.session_key)
+        self.assertEqual(session["user"], "reader")
+        self.assertLessEqual(self.cache_ttl(session), 60)
+
+    @override_settings(SESSION_CACHE_TIMEOUT=60)
+    def test_sessions_expiring_sooner_leave_the_cache_with_them(self):
+        session = sessions.SessionStore()
+        session.set_expiry(10)
+        session.save()
+        self.assertLessEqual(self.cache_ttl(session), 10)
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class LoginTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        for limiter in (throttle.ip_limiter, throttle.username_limiter):
+            limiter.attempts.clear()
+
+    def log_in(self, password, username="reader"):
+        return self.client.post(reverse("login"), {"username": username, "password": password})
+
+    def test_login(self):
+        self.assertContains(self.log_in("faux"), "Identifiants invalides.")
+        self.assertRedirects(self.log_in("1234Aze!"), reverse("home"), fetch_redirect_response=False)
+
+    def test_hashes_are_upgraded_on_login(self):
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.log_in("1234Aze!")
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$2000$"))
+        self.assertTrue(self.user.check_password("1234Aze!"))
+
+    def test_failed_attempts_are_limited_per_username(self):
+        for _ in range(5):
+            self.log_in("faux")
+        response = self.log_in("1234Aze!")
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(response.has_header("Retry-After"))
+        self.assertEqual(self.log_in("faux", username="other").status_code, 200)
+
+    def test_attempts_are_limited_per_address(self):
+        for index in range(20):
+            self.log_in("faux", username=f"user{index}")
+        self.assertEqual(self.log_in("1234Aze!").status_code, 429)
+
+    @override_settings(LOGIN_CLIENT_IP_HEADER="X-Forwarded-For")
+    def test_attempts_are_limited_per_forwarded_address(self):
+        # the addresses before the last one come from the client
+        for index in range(20):
+            self.client.post(
+                reverse("login"), {"username": f"user{index}", "password": "faux"},
+                HTTP_X_FORWARDED_FOR=f"10.0.0.{index}, 203.0.113.7")
+        response = self.client.post(
+            reverse("login"), {"username": "reader", "password": "1234Aze!"}, HTTP_X_FORWARDED_FOR="203.0.113.7")
+        self.assertEqual(response.status_code, 429)
+        response = self.client.post(
+            reverse("login"), {"username": "reader", "password": "1234Aze!"}, HTTP_X_FORWARDED_FOR="203.0.113.8")
+        self.assertEqual(response.status_code, 302)
+
+    def test_busy_password_checks_turn_logins_away(self):
+        with mock.patch.object(passwords, "pending", threading.Semaphore(0)):
+            response = self.log_in("1234Aze!")
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response["Retry-After"], "1")
+            self.assertContains(response, "Le service est très sollicité", status_code=503)
+            # the admin login form answers as for invalid credentials
+            self.user.is_staff = True
+            self.user.save()
+            response = self.client.post(reverse("admin:login"), {"username": "reader", "password": "1234Aze!"})
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.wsgi_request.user.is_authenticated)
+        self.assertEqual(throttle.username_limiter.retry_after("reader"), 0)
+        self.assertRedirects(self.log_in("1234Aze!"), reverse("home"), fetch_redirect_response=False)
+
+    def test_limiter_window_slides(self):
+        limiter = throttle.SlidingWindowLimiter(2, 60, 2)
+        limiter.add("a")
+        limiter.add("a")
+        self.assertGreater(limiter.retry_after("a"), 0)
+        limiter.attempts["a"][0] -= 60
+        self.assertEqual(limiter.retry_after("a"), 0)
+        limiter.add("b")
+        limiter.add("c")
+        self.assertEqual(list(limiter.attempts), ["b", "c"])
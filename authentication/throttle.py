@@ -0,0 +1,60 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+
+
+class SlidingWindowLimiter:
+    # times of the attempts of the last `window` seconds per key, in the memory of the process,
+    # the least recently used keys are forgotten beyond max_keys
+    def __init__(self, limit, window, max_keys):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self.attempts = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_attempts(self, key, now):
+        attempts = self.attempts.get(key)
+        if attempts is None:
+            attempts = self.attempts[key] = deque()
+            if len(self.attempts) > self.max_keys:
+                self.attempts.popitem(last=False)
+        self.attempts.move_to_end(key)
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+        return attempts
+
+    def retry_after(self, key):
+        # seconds until the key may try again, 0 when it is not limited
+        now = time.monotonic()
+        with self.lock:
+            attempts = self.get_attempts(key, now)
+            if len(attempts) < self.limit:
+                return 0
+            return max(1, round(attempts[0] + self.window - now))
+
+    def add(self, key):
+        now = time.monotonic()
+        with self.lock:
+            self.get_attempts(key, now).append(now)
+
+    def reset(self, key):
+        with self.lock:
+            self.attempts.pop(key, None)
+
+
+def get_client_address(request):
+    header = settings.LOGIN_CLIENT_IP_HEADER
+    if header:
+        addresses = request.headers.get(header, "").split(",")
+        if addresses[-1].strip():
+            return addresses[-1].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+# every attempt counts for the address, only the failed ones for the username
+ip_limiter = SlidingWindowLimiter(settings.LOGIN_IP_LIMIT, settings.LOGIN_IP_WINDOW, settings.LOGIN_THROTTLE_MAX_KEYS)
+username_limiter = SlidingWindowLimiter(
+    settings.LOGIN_USERNAME_LIMIT, settings.LOGIN_USERNAME_WINDOW, settings.LOGIN_THROTTLE_MAX_KEYS)
@@ -4,7 +4,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import redirect, render
 from django.views.generic import View
 
-from . import forms
+from . import forms, throttle
 
 
 class SignUpView(View):
@@ -35,17 +35,35 @@ class LoginView(View, LoginRequiredMixin):
 
     def post(self, request):
         form = self.form_class(request.POST)
+        address = throttle.get_client_address(request)
+        username = request.POST.get("username", "").casefold()
+        retry_after = max(throttle.ip_limiter.retry_after(address), throttle.username_limiter.retry_after(username))
+        if retry_after:
+            message = "Trop de tentatives de connexion, veuillez réessayer plus tard."
+            return self.refuse(form, message, 429, retry_after)
+        throttle.ip_limiter.add(address)
         if form.is_valid():
             user = authenticate(
+                request,
                 username=form.cleaned_data["username"],
                 password=form.cleaned_data["password"],
             )
+            if getattr(request, "password_checks_busy", False):
+                message = "Le service est très sollicité, veuillez réessayer dans quelques instants."
+                return self.refuse(form, message, 503, 1)
             if user is not None:
+                throttle.username_limiter.reset(username)
                 login(request, user)
                 return redirect("home")
+            throttle.username_limiter.add(username)
         message = "Identifiants invalides."
         return render(request, self.template_name, context={"form": form, "message": message})
 
+    def refuse(self, form, message, status, retry_after):
+        response = render(self.request, self.template_name, context={"form": form, "message": message}, status=status)
+        response["Retry-After"] = str(retry_after)
+        return response
+
 
 def logout_user(request):
     logout(request)
@@ -0,0 +1,51 @@
+import random
+import sqlite3
+import time
+
+from django.db.backends.sqlite3 import base
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    # retries statements running outside of a transaction when another connection holds the write lock
+    # for longer than the busy timeout, a statement inside a transaction would risk a deadlock
+
+    def __init__(self, connection, database_wrapper):
+        super().__init__(connection)
+        self.database_wrapper = database_wrapper
+
+    def execute(self, query, params=None):
+        retries = self.database_wrapper.busy_retries
+        for attempt in range(retries + 1):
+            try:
+                return super().execute(query, params)
+            except sqlite3.OperationalError as error:
+                retryable = not self.database_wrapper.in_atomic_block or query.startswith("BEGIN")
+                if "database is locked" not in str(error) or not retryable or attempt == retries:
+                    raise
+                time.sleep(self.database_wrapper.busy_backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # SQLite backend applying the PRAGMAS of OPTIONS on every new connection, taking the write lock
+    # when a transaction begins and retrying statements refused with "database is locked"
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = kwargs.pop("pragmas", {})
+        self.busy_retries = kwargs.pop("busy_retries", 0)
+        self.busy_backoff = kwargs.pop("busy_backoff", 0.05)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for pragma, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(factory=lambda connection: SQLiteCursorWrapper(connection, self))
+
+    def _start_transaction_under_autocommit(self):
+        # a deferred transaction upgrading its read lock to a write lock fails immediately when another
+        # writer is active, taking the write lock upfront lets the busy timeout wait for it instead
+        self.cursor().execute("BEGIN IMMEDIATE")
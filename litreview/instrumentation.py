@@ -0,0 +1,196 @@
+import logging
+import math
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+from django.template.backends import django as django_backend, jinja2 as jinja2_backend
+
+logger = logging.getLogger(__name__)
+
+current_metrics = ContextVar("current_metrics", default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0
+        self.template_time = 0
+        self.view_start = None
+        self.rendering = False
+        self.statements = Counter()
+
+
+class RollingStats:
+    # keeps the last INSTRUMENTATION_WINDOW requests of every URL name
+    def __init__(self, size):
+        self.samples = defaultdict(lambda: deque(maxlen=size))
+        self.lock = threading.Lock()
+
+    def record(self, name, duration, queries):
+        with self.lock:
+            self.samples[name].append((duration, queries))
+
+    def summary(self):
+        with self.lock:
+            samples = {name: list(values) for name, values in self.samples.items()}
+        summary = {}
+        for name, values in samples.items():
+            durations = sorted(duration for duration, _ in values)
+            queries = sorted(count for _, count in values)
+            summary[name] = {
+                "requests": len(values),
+                "p50_ms": round(percentile(durations, 50) * 1000, 2),
+                "p90_ms": round(percentile(durations, 90) * 1000, 2),
+                "p99_ms": round(percentile(durations, 99) * 1000, 2),
+                "queries_p50": percentile(queries, 50),
+                "queries_max": queries[-1],
+            }
+        return summary
+
+
+stats = RollingStats(settings.INSTRUMENTATION_WINDOW)
+
+
+def percentile(sorted_values, rank):
+    # nearest-rank percentile
+    return sorted_values[max(0, math.ceil(rank / 100 * len(sorted_values)) - 1)]
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.sql_time += time.perf_counter() - start
+            metrics.statements[sql] += 1
+
+
+def instrument_connection(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def instrument_queries():
+    # installed on every connection rather than per request, async views query the database from other
+    # threads, the metrics of the request still reach them through the context variable
+    connection_created.connect(instrument_connection, dispatch_uid="litreview.instrumentation")
+    for connection in connections.all():
+        instrument_connection(connection)
+
+
+class TimedTemplate:
+    # times the top level renders, included templates and snippets rendered meanwhile are part of them
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = current_metrics.get()
+        if metrics is None or metrics.rendering:
+            return self.template.render(context, request)
+        metrics.rendering = True
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+            metrics.rendering = False
+
+
+class TimedTemplatesMixin:
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+
+class DjangoTemplates(TimedTemplatesMixin, django_backend.DjangoTemplates):
+    pass
+
+
+class Jinja2(TimedTemplatesMixin, jinja2_backend.Jinja2):
+    pass
+
+
+class InstrumentationMiddleware:
+    # first of MIDDLEWARE, measures every request and reports it in a Server-Timing header, async under ASGI
+    # so that async views are not run through async_to_sync
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        instrument_queries()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.report(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.report(request, response, metrics, start)
+
+    def report(self, request, response, metrics, start):
+        end = time.perf_counter()
+        view_time = end - metrics.view_start if metrics.view_start else 0
+
+        repeated = [
+            (sql, count) for sql, count in metrics.statements.most_common(3)
+            if count >= settings.INSTRUMENTATION_REPEATED_QUERY_THRESHOLD]
+        for sql, count in repeated:
+            logger.warning("N+1 query pattern on %s, %s times: %s", request.path, count, sql)
+
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.queries} queries"',
+            f"tpl;dur={metrics.template_time * 1000:.1f}",
+            f"view;dur={view_time * 1000:.1f}",
+            f"total;dur={(end - start) * 1000:.1f}",
+        ])
+        if repeated:
+            response["Server-Timing"] += f', nplusone;desc="{repeated[0][1]} repeated queries"'
+        name = request.resolver_match.view_name if request.resolver_match else "unresolved"
+        stats.record(name, end - start, metrics.queries)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.view_start = time.perf_counter()
+
+
+@staff_member_required
+def stats_view(request):
+    from reviewapp.cache import stats as cache_stats
+
+    return JsonResponse({"views": stats.summary(), "cache": dict(cache_stats)})
@@ -0,0 +1,16 @@
+from django.template.defaultfilters import date, floatformat, pluralize
+from django.templatetags.static import static
+from django.urls import reverse
+from jinja2 import Environment
+
+
+def url(name, *args):
+    return reverse(name, args=args)
+
+
+def environment(**options):
+    # the templates are compiled once and kept by the environment, auto_reload only checks them in DEBUG
+    env = Environment(**options)
+    env.globals.update({"static": static, "url": url})
+    env.filters.update({"date": date, "floatformat": floatformat, "pluralize": pluralize})
+    return env
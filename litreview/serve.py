@@ -0,0 +1,123 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .staticfiles import ENCODINGS
+
+# a single range, multiple ranges are answered with the whole file
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# name.0123456789ab.css as written by the manifest storage
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{12}\.\w+$")
+HASHED_MAX_AGE = 365 * 24 * 60 * 60
+CHUNK_SIZE = 64 * 1024
+
+
+def get_path(root, path):
+    try:
+        full_path = safe_join(root, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    return full_path
+
+
+def get_range(request, etag, size):
+    # (start, end) of the requested range, None for the whole file, ValueError when it is out of the file
+    match = RANGE_RE.match(request.headers.get("Range", ""))
+    if match is None or request.headers.get("If-Range", etag) != etag:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        start, end = size - int(end), size - 1
+        if end < start:
+            raise ValueError
+        return max(start, 0), end
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start > end:
+        raise ValueError
+    return start, end
+
+
+def read_range(file, length):
+    try:
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def file_response(request, path, content_type, cache_control):
+    # whole files go through FileResponse, which WSGI servers send with sendfile() through wsgi.file_wrapper
+    stat = os.stat(path)
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        try:
+            byte_range = get_range(request, etag, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{stat.st_size}"
+            return response
+        file = open(path, "rb")
+        if byte_range is None:
+            response = FileResponse(file, content_type=content_type)
+        else:
+            start, end = byte_range
+            file.seek(start)
+            response = StreamingHttpResponse(read_range(file, end - start + 1), status=206, content_type=content_type)
+            response["Content-Length"] = end - start + 1
+            response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+        response["Accept-Ranges"] = "bytes"
+        response["Last-Modified"] = http_date(stat.st_mtime)
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
+
+
+def accepted_variant(request, path):
+    # precompressed variant of the file accepted by the client, brotli first
+    accepted = request.headers.get("Accept-Encoding", "")
+    for encoding, (extension, _) in ENCODINGS.items():
+        if re.search(rf"\b{encoding}\b", accepted) and os.path.isfile(path + extension):
+            return encoding, path + extension
+    return None, path
+
+
+@require_safe
+def static_view(request, path):
+    # files collected in STATIC_ROOT, the hashed names never change and are cached for a year
+    full_path = get_path(settings.STATIC_ROOT, path)
+    encoding, served_path = accepted_variant(request, full_path)
+    if HASHED_NAME_RE.search(path):
+        cache_control = f"public, max-age={HASHED_MAX_AGE}, immutable"
+    else:
+        cache_control = f"public, max-age={settings.STATIC_CACHE_MAX_AGE}"
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    response = file_response(request, served_path, content_type, cache_control)
+    if encoding and response.status_code in (200, 206):
+        response["Content-Encoding"] = encoding
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+@require_safe
+def media_view(request, path):
+    full_path = get_path(settings.MEDIA_ROOT, path)
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    return file_response(request, full_path, content_type, f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}")
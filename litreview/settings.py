@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'litreview.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,11 +53,18 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Requests statistics of the instrumentation middleware, see /stats/ with a staff account
+INSTRUMENTATION_WINDOW = 1000
+# a request running the same statement that many times is logged as an N+1 query pattern
+INSTRUMENTATION_REPEATED_QUERY_THRESHOLD = 5
+
 ROOT_URLCONF = 'litreview.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # the backends of litreview.instrumentation time the renders of every request
+        'NAME': 'django',
+        'BACKEND': 'litreview.instrumentation.DjangoTemplates',
         'DIRS': [
             BASE_DIR.joinpath('litreview/templates'),
         ],
@@ -69,9 +78,44 @@ TEMPLATES = [
             ],
         },
     },
+    {
+        'NAME': 'jinja2',
+        'BACKEND': 'litreview.instrumentation.Jinja2',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'environment': 'litreview.jinja2.environment',
+            'context_processors': [
+                'django.contrib.auth.context_processors.auth',
+            ],
+        },
+    },
 ]
 
 WSGI_APPLICATION = 'litreview.wsgi.application'
+ASGI_APPLICATION = 'litreview.asgi.application'
+
+# LITREVIEW_ASYNC_VIEWS=1 serves the feed, posts and follow pages with the async views of
+# reviewapp.async_views, to be deployed under an ASGI server (uvicorn litreview.asgi:application)
+ASYNC_VIEWS = os.environ.get('LITREVIEW_ASYNC_VIEWS') == '1'
+
+# LITREVIEW_JINJA2_FEED=1 renders the posts of the feed and posts pages with the Jinja2 templates of reviewapp/jinja2,
+# their post snippets are macros compiled once per process rather than a template rendered per post, the pages
+# around them keep the Django templates
+JINJA2_FEED = os.environ.get('LITREVIEW_JINJA2_FEED') == '1'
+
+# LITREVIEW_REDIS_URL=redis://localhost:6379/0 shares the caches between the server processes (the redis package
+# to be installed). Without it every process has its own local memory caches, whose invalidations (logout,
+# password change, new posts, follows) never reach the other processes, so their entries are kept a short time
+REDIS_URL = os.environ.get('LITREVIEW_REDIS_URL')
+SHARED_CACHE = REDIS_URL is not None
+
+# With the async views, new posts are pushed to the home page of their audience as server-sent events,
+# every connection buffers at most SSE_QUEUE_SIZE events and is dropped once it falls behind, streams
+# send a comment every SSE_HEARTBEAT seconds and end after SSE_MAX_DURATION seconds, browsers reconnect
+SSE_QUEUE_SIZE = 100
+SSE_HEARTBEAT = 15
+SSE_MAX_DURATION = 5 * 60
 
 
 # Database
@@ -84,6 +128,32 @@ DATABASES = {
     }
 }
 
+# Applied on every connection by the production profile, WAL lets readers run during a write,
+# NORMAL synchronous is durable in WAL mode except on power loss, negative cache_size is in KiB
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Tuned SQLite backend with persistent connections, enabled by LITREVIEW_DB_PROFILE=production
+SQLITE_PRODUCTION_PROFILE = {
+    'ENGINE': 'litreview.db',
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {
+        # seconds a connection waits for a lock before "database is locked"
+        'timeout': 20,
+        'busy_retries': 5,
+        'pragmas': SQLITE_PRAGMAS,
+    },
+}
+
+if os.environ.get('LITREVIEW_DB_PROFILE') == 'production':
+    DATABASES['default'].update(SQLITE_PRODUCTION_PROFILE)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -103,6 +173,37 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# The first hasher hashes the new passwords, the hashes of the other hashers or of another PBKDF2 work factor
+# are upgraded on the next successful login, LITREVIEW_PASSWORD_HASHER=argon2 needs the argon2-cffi package
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('LITREVIEW_PBKDF2_ITERATIONS', 600000))
+PASSWORD_HASHERS = [
+    'authentication.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if os.environ.get('LITREVIEW_PASSWORD_HASHER') == 'argon2':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(2))
+
+# Passwords are checked by a pool of PASSWORD_CHECK_WORKERS threads, logins are refused while
+# PASSWORD_CHECK_MAX_PENDING checks are already waiting
+PASSWORD_CHECK_WORKERS = 2
+PASSWORD_CHECK_MAX_PENDING = 20
+
+# Login attempts are limited to LOGIN_IP_LIMIT per address in LOGIN_IP_WINDOW seconds, and failed ones to
+# LOGIN_USERNAME_LIMIT per username in LOGIN_USERNAME_WINDOW seconds, in the memory of every process
+LOGIN_IP_LIMIT = 20
+LOGIN_IP_WINDOW = 60
+LOGIN_USERNAME_LIMIT = 5
+LOGIN_USERNAME_WINDOW = 5 * 60
+LOGIN_THROTTLE_MAX_KEYS = 10000
+
+# Behind a reverse proxy every request comes from the address of the proxy, the address of the client is then
+# read from the request header the proxy sets, e.g. LITREVIEW_CLIENT_IP_HEADER=X-Forwarded-For, the last address
+# of the header being the one the proxy saw, the others are sent by the client
+LOGIN_CLIENT_IP_HEADER = os.environ.get('LITREVIEW_CLIENT_IP_HEADER')
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -121,6 +222,10 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR.joinpath('static/')]
+# collectstatic copies the files under their hashed names with their gzip and brotli variants,
+# litreview.serve serves them with the unhashed ones cached STATIC_CACHE_MAX_AGE seconds
+STATIC_ROOT = BASE_DIR.joinpath('staticfiles/')
+STATIC_CACHE_MAX_AGE = 60 * 60
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -129,9 +234,122 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'authentication.User'
 
+# The user of every request is cached USER_CACHE_TIMEOUT seconds, and dropped when it changes, with local
+# memory caches the other processes still see a deactivated user or a changed password for that long
+AUTHENTICATION_BACKENDS = ['authentication.backends.CachedModelBackend']
+USER_CACHE_TIMEOUT = 60 if SHARED_CACHE else 10
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = LOGIN_URL
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR.joinpath('media/')
+MEDIA_CACHE_MAX_AGE = 24 * 60 * 60
+
+# Ticket images are served through fixed width JPEG and WebP derivatives stored under
+# MEDIA_ROOT/THUMBNAIL_DIR, 160px is the width of the images in the feed, 320px for dense screens
+THUMBNAIL_DIR = 'thumbnails'
+THUMBNAIL_WIDTHS = [160, 320]
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_WORKERS = 2
+
+# Ticket image uploads are rejected beyond IMAGE_UPLOAD_MAX_SIZE while they are streamed, and
+# beyond IMAGE_MAX_PIXELS from their header, images larger than IMAGE_MAX_DIMENSION are downscaled once
+IMAGE_UPLOAD_MAX_SIZE = 5 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MAX_DIMENSION = 1600
+IMAGE_DOWNSCALE_QUALITY = 85
+
+FILE_UPLOAD_HANDLERS = [
+    'reviewapp.uploads.SizeLimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Uploads are stored once per content, see reviewapp.storage
+STORAGES = {
+    'default': {
+        'BACKEND': 'reviewapp.storage.ContentAddressedStorage',
+    },
+    # the hashed names need collectstatic, the development server serves the files as they are
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'litreview.staticfiles.CompressedManifestStaticFilesStorage'),
+    },
+}
+
+# Number of posts per page of the home feed and of the user posts
+FEED_PAGE_SIZE = 20
+
+# Answers to the polls for new posts of the home feed are cached per user for FEED_POLL_CACHE_TIMEOUT
+# seconds on top of the feed version, clients are asked to poll every FEED_POLL_INTERVAL seconds
+FEED_POLL_CACHE_TIMEOUT = 5
+FEED_POLL_INTERVAL = 30
+
+# Username search of the follow page, prefix matches come from the index of the case-folded usernames,
+# close matches are looked for among at most USER_SEARCH_FUZZY_CANDIDATES usernames sharing the first
+# letter of queries of USER_SEARCH_FUZZY_MIN_LENGTH letters or more, for at most USER_SEARCH_TIME_BUDGET seconds
+USER_SEARCH_LIMIT = 10
+USER_SEARCH_FUZZY_MIN_LENGTH = 3
+USER_SEARCH_FUZZY_CANDIDATES = 2000
+USER_SEARCH_TIME_BUDGET = 0.05
+USER_SEARCH_CACHE_TIMEOUT = 60
+
+# Full-text search of the tickets and reviews, SEARCH_SNIPPET_WORDS words of text are shown around the matches
+SEARCH_SNIPPET_WORDS = 16
+SEARCH_MAX_PAGES = 50
+
+# Rendered post snippets are cached per post version and feed pages per viewer, the follow graphs per user,
+# FEED_CACHE_MAX_ENTRIES bounds the memory of the cache. Pages and follow graphs are invalidated by the process
+# handling the change, the others only see it once their local entries expire after FEED_CACHE_TIMEOUT seconds,
+# the snippet keys change with their posts and hold in every process
+FEED_CACHE_TIMEOUT = 60 * 60 if SHARED_CACHE else 60
+SNIPPET_CACHE_TIMEOUT = 60 * 60
+FEED_CACHE_MAX_ENTRIES = 10000
+
+# Sessions are read from their own cache and written through to the database, which still holds
+# the sessions evicted from the cache, a logout only clears the local memory cache of its own process
+# so the other processes keep accepting the session for SESSION_CACHE_TIMEOUT seconds, see authentication.sessions
+SESSION_ENGINE = 'authentication.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_COOKIE_AGE = 60 * 60 * 24 * 14
+SESSION_CACHE_TIMEOUT = SESSION_COOKIE_AGE if SHARED_CACHE else 60
+SESSION_CACHE_MAX_ENTRIES = 10000
+
+if SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'TIMEOUT': FEED_CACHE_TIMEOUT,
+            'KEY_PREFIX': 'litreview',
+        },
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'TIMEOUT': SESSION_CACHE_TIMEOUT,
+            'KEY_PREFIX': 'litreview-sessions',
+        },
+    }
+else:
+    # local memory evicts the least recently used entries once MAX_ENTRIES is reached
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'litreview',
+            'TIMEOUT': FEED_CACHE_TIMEOUT,
+            'OPTIONS': {
+                'MAX_ENTRIES': FEED_CACHE_MAX_ENTRIES,
+            },
+        },
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'litreview-sessions',
+            'TIMEOUT': SESSION_CACHE_TIMEOUT,
+            'OPTIONS': {
+                'MAX_ENTRIES': SESSION_CACHE_MAX_ENTRIES,
+            },
+        },
+    }
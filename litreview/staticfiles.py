@@ -0,0 +1,47 @@
+import gzip
+from pathlib import PurePosixPath
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# the other files (images, fonts) are already compressed
+COMPRESSED_EXTENSIONS = {'.css', '.js', '.svg', '.txt', '.json', '.html', '.xml', '.map'}
+# below this size the headers weigh more than what compression saves
+COMPRESS_MIN_SIZE = 256
+
+# encoding -> (extension, compression function) of the precompressed variants, brotli needs the brotli package
+ENCODINGS = {'gzip': ('.gz', lambda content: gzip.compress(content, compresslevel=9, mtime=0))}
+if brotli is not None:
+    ENCODINGS = {'br': ('.br', lambda content: brotli.compress(content, quality=11)), **ENCODINGS}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # collectstatic names the files after their content and writes their gzip and brotli variants
+    # next to them, litreview.serve picks the variant accepted by the client
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in paths:
+            self.compress(self.stored_name(name))
+
+    def compress(self, name):
+        if PurePosixPath(name).suffix not in COMPRESSED_EXTENSIONS:
+            return
+        with self.open(name) as file:
+            content = file.read()
+        if len(content) < COMPRESS_MIN_SIZE:
+            return
+        for extension, compress in ENCODINGS.values():
+            compressed = compress(content)
+            if len(compressed) < len(content):
+                compressed_name = name + extension
+                if self.exists(compressed_name):
+                    self.delete(compressed_name)
+                self.save(compressed_name, ContentFile(compressed))
@@ -0,0 +1,153 @@
+import gzip
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from authentication.models import User
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'litreview.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+
+
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        self.static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.static_root.cleanup)
+        overrides = override_settings(STATIC_ROOT=self.static_root.name, STORAGES=STORAGES)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+        self.hashed_css = next(Path(self.static_root.name).glob("styles.*.css")).name
+
+    def test_collected_files_are_hashed_and_compressed(self):
+        path = Path(self.static_root.name, self.hashed_css)
+        self.assertEqual(gzip.decompress(path.with_name(path.name + ".gz").read_bytes()), path.read_bytes())
+        # images are already compressed
+        self.assertEqual(list(Path(self.static_root.name, "images").glob("*.gz")), [])
+
+    def test_hashed_files_are_cached_for_a_year(self):
+        response = self.client.get(f"/static/{self.hashed_css}", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        response = self.client.get("/static/styles.css")
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class MediaTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        overrides = override_settings(MEDIA_ROOT=self.media_root.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        Path(self.media_root.name, "image.jpg").write_bytes(bytes(range(100)))
+
+    def test_ranges(self):
+        response = self.client.get("/media/image.jpg", HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(10, 20)))
+        self.assertEqual(response["Content-Range"], "bytes 10-19/100")
+        response = self.client.get("/media/image.jpg", HTTP_RANGE="bytes=-5")
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(95, 100)))
+        response = self.client.get("/media/image.jpg", HTTP_RANGE="bytes=200-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */100")
+
+    def test_conditional_requests(self):
+        response = self.client.get("/media/image.jpg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        response = self.client.get("/media/image.jpg", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertTrue(response.has_header("ETag"))
+
+    def test_paths_outside_the_media_root_are_not_served(self):
+        self.assertEqual(self.client.get("/media/../settings.py").status_code, 404)
+        self.assertEqual(self.client.get("/media/%2E%2E/litreview/settings.py").status_code, 404)
+        self.assertEqual(self.client.post("/media/image.jpg").status_code, 405)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        self.client.force_login(self.user)
+
+    def get_timings(self, response):
+        return dict(timing.split(";", 1) for timing in response["Server-Timing"].split(", "))
+
+    def test_server_timing_reports_the_request(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("add-follower"))
+        timings = self.get_timings(response)
+        self.assertEqual(set(timings), {"db", "tpl", "view", "total"})
+        self.assertIn(f'desc="{len(context.captured_queries)} queries"', timings["db"])
+        self.assertGreater(float(timings["tpl"].removeprefix("dur=")), 0)
+
+    def test_stats_are_for_staff_only(self):
+        self.client.get(reverse("add-follower"))
+        self.assertEqual(self.client.get(reverse("stats")).status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        data = self.client.get(reverse("stats")).json()
+        self.assertGreaterEqual(data["views"]["add-follower"]["requests"], 1)
+        self.assertIn("cache", data)
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = str(Path(directory.name) / "db.sqlite3")
+        # a connection of the production profile which gives up on a lock at once, and another holding the lock
+        options = {**settings.SQLITE_PRODUCTION_PROFILE["OPTIONS"], "timeout": 0, "busy_backoff": 0}
+        handler = ConnectionHandler(
+            {DEFAULT_DB_ALIAS: {**settings.SQLITE_PRODUCTION_PROFILE, "NAME": path, "OPTIONS": options}})
+        self.connection = handler[DEFAULT_DB_ALIAS]
+        self.addCleanup(self.connection.close)
+        with self.connection.cursor() as cursor:
+            cursor.execute("CREATE TABLE ticket (title TEXT)")
+        self.locker = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.addCleanup(self.locker.close)
+        self.locker.execute("BEGIN IMMEDIATE")
+
+    def insert(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("INSERT INTO ticket (title) VALUES (%s)", ["Dune"])
+
+    def test_pragmas_are_applied(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone(), ("wal",))
+
+    def test_locked_statements_are_retried(self):
+        # the lock is released during the first backoff
+        with mock.patch("litreview.db.base.time.sleep", side_effect=lambda _: self.locker.execute("COMMIT")) as sleep:
+            self.insert()
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(self.locker.execute("SELECT title FROM ticket").fetchall(), [("Dune",)])
+
+    def test_retries_are_bounded(self):
+        with mock.patch("litreview.db.base.time.sleep") as sleep, self.assertRaises(OperationalError):
+            self.insert()
+        self.assertEqual(sleep.call_count, settings.SQLITE_PRODUCTION_PROFILE["OPTIONS"]["busy_retries"])
+
+    def test_statements_of_a_transaction_are_not_retried(self):
+        self.connection.in_atomic_block = True
+        self.addCleanup(setattr, self.connection, "in_atomic_block", False)
+        with mock.patch("litreview.db.base.time.sleep") as sleep, self.assertRaises(OperationalError):
+            self.insert()
+        sleep.assert_not_called()
@@ -1,18 +1,26 @@
+import re
+
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
 
 import authentication.views
+import reviewapp.api
+import reviewapp.async_views
 import reviewapp.views
+from litreview import instrumentation, serve
+
+feed_views = reviewapp.async_views if settings.ASYNC_VIEWS else reviewapp.views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('stats/', instrumentation.stats_view, name='stats'),
     path('signup/', authentication.views.SignUpView.as_view(), name="signup"),
     path('login/', authentication.views.LoginView.as_view(), name="login"),
     path('logout/', authentication.views.logout_user, name='logout'),
-    path('', reviewapp.views.Home.as_view(), name='home'),
-    path('posts/', reviewapp.views.Posts.as_view(), name='posts'),
+    path('', feed_views.Home.as_view(), name='home'),
+    path('posts/', feed_views.Posts.as_view(), name='posts'),
+    path('search/', reviewapp.views.SearchView.as_view(), name='search'),
     path('tickets/add/', reviewapp.views.TicketCreationView.as_view(), name='ticket-create'),
     path('tickets/<int:ticket_id>/update/', reviewapp.views.UpdateTicketView.as_view(), name='update-ticket'),
     path('tickets/<int:ticket_id>/delete/', reviewapp.views.DeleteTicketView.as_view(), name='delete-ticket'),
@@ -20,9 +28,18 @@ urlpatterns = [
     path('review/<int:review_id>/update/', reviewapp.views.UpdateReviewView.as_view(), name='update-review'),
     path('review/<int:review_id>/delete/', reviewapp.views.DeleteReviewView.as_view(), name='delete-review'),
     path('tickets/review/add/', reviewapp.views.FullReviewView.as_view(), name='review-ticket-create'),
-    path('follower/add/', reviewapp.views.FollowerAddView.as_view(), name='add-follower'),
-    path('follower/<int:follower_id>/delete/', reviewapp.views.DeleteFollowerView.as_view(), name='delete-follower')
+    path('follower/add/', feed_views.FollowerAddView.as_view(), name='add-follower'),
+    path('follower/<int:follower_id>/delete/', reviewapp.views.DeleteFollowerView.as_view(), name='delete-follower'),
+    path('followers/delete/', reviewapp.views.DeleteFollowersView.as_view(), name='delete-followers'),
+    path('api/feed/', reviewapp.api.FeedAPIView.as_view(), name='api-feed'),
+    path('api/feed/new/', reviewapp.api.NewPostsAPIView.as_view(), name='api-feed-new'),
+    path('api/posts/', reviewapp.api.PostsAPIView.as_view(), name='api-posts'),
+    path('api/follows/', reviewapp.api.FollowsAPIView.as_view(), name='api-follows'),
+    path('api/users/search/', reviewapp.api.UserSearchAPIView.as_view(), name='api-user-search'),
+    # the development server serves the static files itself while DEBUG is on
+    re_path(rf'^{re.escape(settings.STATIC_URL.lstrip("/"))}(?P<path>.+)$', serve.static_view, name='static'),
+    re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.+)$', serve.media_view, name='media'),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+if settings.ASYNC_VIEWS:
+    urlpatterns.append(path('events/', reviewapp.async_views.EventStreamView.as_view(), name='events'))
@@ -0,0 +1,175 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import Max
+from django.http import JsonResponse
+from django.views.decorators.http import condition
+from django.views.generic import View
+
+from . import cache, feed, follows, models
+
+
+def select_fields(data, fields):
+    # the type is always kept so that clients can tell tickets from reviews
+    if fields is None:
+        return data
+    return {key: value for key, value in data.items() if key in fields or key == "type"}
+
+
+def ticket_fields(ticket, request):
+    return {
+        "id": ticket.id,
+        "title": ticket.title,
+        "description": ticket.description,
+        "image": request.build_absolute_uri(ticket.image.url) if ticket.image else None,
+        "user": ticket.user.username,
+        "time_created": ticket.time_created.isoformat(),
+    }
+
+
+def serialize_ticket(ticket, request):
+    return {
+        "type": "ticket",
+        **ticket_fields(ticket, request),
+        "has_review": ticket.has_review,
+        "review_count": ticket.review_count,
+        "average_rating": ticket.average_rating,
+        "rating_distribution": ticket.rating_distribution(),
+        "last_review_time": ticket.last_review_time.isoformat() if ticket.last_review_time else None,
+    }
+
+
+def serialize_review(review, request):
+    return {
+        "type": "review",
+        "id": review.id,
+        "headline": review.headline,
+        "rating": review.rating,
+        "body": review.body,
+        "user": review.user.username,
+        "time_created": review.time_created.isoformat(),
+        "ticket": ticket_fields(review.ticket, request),
+    }
+
+
+def serialize_post(post, request):
+    if post.content_type == feed.TICKET:
+        return serialize_ticket(post, request)
+    return serialize_review(post, request)
+
+
+def newest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def revalidated_response(data):
+    response = JsonResponse(data)
+    # clients keep the response but revalidate it on every use
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+class APIView(LoginRequiredMixin, View):
+    # answers with a 403 rather than a redirection to the login page
+    raise_exception = True
+
+    def get_fields(self):
+        fields = self.request.GET.get("fields")
+        return set(fields.split(",")) if fields else None
+
+    def serialize_page(self, page):
+        fields = self.get_fields()
+        return [select_fields(serialize_post(post, self.request), fields) for post in page.posts]
+
+
+class FeedAPIView(APIView):
+    def get_page(self):
+        return feed.timeline_feed(self.request.user, self.request.GET.get("cursor"))
+
+    def get_newest(self):
+        entries = models.FeedEntry.objects.filter(owner=self.request.user).order_by("-time_created")
+        return entries.values_list("time_created", flat=True).first()
+
+    def get_data(self):
+        page = self.get_page()
+        return {"results": self.serialize_page(page), "next": page.next_cursor, "since": page.since_cursor}
+
+    def get_validators(self):
+        # the newest time_created moves with new posts, the feed version of the user and its creation time
+        # with edits, deletions and follows, computed once for both the ETag and the Last-Modified header
+        if not hasattr(self, "validators"):
+            newest_time = self.get_newest()
+            version = cache.get_feed_version(self.request.user.id)
+            raw = f"{version}:{newest_time.isoformat() if newest_time else ''}:{self.request.GET.urlencode()}"
+            last_modified = newest(newest_time, cache.get_version_time(version))
+            self.validators = (hashlib.md5(raw.encode()).hexdigest(), last_modified)
+        return self.validators
+
+    def etag(self, request, *args, **kwargs):
+        return self.get_validators()[0]
+
+    def last_modified(self, request, *args, **kwargs):
+        return self.get_validators()[1]
+
+    def respond(self, request, *args, **kwargs):
+        return revalidated_response(self.get_data())
+
+    def get(self, request, *args, **kwargs):
+        return condition(etag_func=self.etag, last_modified_func=self.last_modified)(self.respond)(request)
+
+
+class NewPostsAPIView(APIView):
+    # polled for the posts created after the since cursor of a feed page, or only their number with ?count=1,
+    # answers are cached a few seconds per user on top of its feed version which new posts change
+    def get(self, request, *args, **kwargs):
+        since = feed.decode_cursor(request.GET.get("since"), 2)
+        if since is None:
+            return JsonResponse({"error": "Le paramètre since est invalide."}, status=400)
+        data = cache.get_or_render_page(
+            "new-posts", request.user, request.GET.urlencode(), lambda: self.poll(since),
+            settings.FEED_POLL_CACHE_TIMEOUT)
+        return JsonResponse(data)
+
+    def poll(self, since):
+        if self.request.GET.get("count"):
+            return {"count": feed.count_new_posts(self.request.user, since)}
+        page, has_more = feed.new_posts(self.request.user, since)
+        return {"results": self.serialize_page(page), "since": page.since_cursor, "more": has_more}
+
+
+class PostsAPIView(FeedAPIView):
+    def get_page(self):
+        return feed.user_posts(self.request.user, self.request.GET.get("cursor"))
+
+    def get_newest(self):
+        tickets = models.Ticket.objects.filter(user=self.request.user).aggregate(newest=Max("time_created"))
+        reviews = models.Review.objects.filter(user=self.request.user).aggregate(newest=Max("time_created"))
+        return newest(tickets["newest"], reviews["newest"])
+
+
+class FollowsAPIView(APIView):
+    # follows carry no date, the ETag is the version of the follow graph of the user
+    def get_data(self):
+        users_links = follows.get_follows(self.request.user)
+        return {
+            "following": [user.username for user in users_links["subscriptions"]],
+            "followers": [user.username for user in users_links["subscribers"]],
+        }
+
+    def etag(self, request, *args, **kwargs):
+        return follows.get_version(request.user.id)
+
+    def respond(self, request, *args, **kwargs):
+        return revalidated_response(self.get_data())
+
+    def get(self, request, *args, **kwargs):
+        return condition(etag_func=self.etag)(self.respond)(request)
+
+
+class UserSearchAPIView(APIView):
+    # type-ahead of the follow page, ?q= is a username prefix
+    def get(self, request, *args, **kwargs):
+        usernames = follows.search_usernames(request.GET.get("q", ""))
+        return JsonResponse({"results": [username for username in usernames if username != request.user.username]})
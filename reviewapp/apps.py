@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ReviewappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reviewapp'
+
+    def ready(self):
+        from . import search, signals  # noqa: F401
+        post_migrate.connect(search.create_missing_triggers, sender=self)
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.mixins import AccessMixin
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import render, redirect
+from django.views.generic import View
+
+from . import cache, events, feed, follows, views
+
+
+class AsyncLoginRequiredMixin(AccessMixin):
+    # LoginRequiredMixin reads request.user synchronously, which queries the database
+    async def dispatch(self, request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return self.handle_no_permission()
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class Home(AsyncLoginRequiredMixin, View):
+    template_name = views.Home.template_name
+    posts_template_name = views.Home.posts_template_name
+
+    async def render_page(self, request, cursor):
+        page = await feed.atimeline_feed(request.user, cursor)
+        return await sync_to_async(views.render_feed_page)(request, self.template_name, self.posts_template_name, page)
+
+    async def get(self, request):
+        cursor = request.GET.get("cursor")
+        content = await cache.aget_or_render_page(
+            "home", request.user, cursor, lambda: self.render_page(request, cursor))
+        return HttpResponse(content)
+
+
+class Posts(AsyncLoginRequiredMixin, View):
+    template_name = views.Posts.template_name
+    posts_template_name = views.Posts.posts_template_name
+
+    async def render_page(self, request, cursor):
+        page = await feed.auser_posts(request.user, cursor)
+        return await sync_to_async(views.render_feed_page)(request, self.template_name, self.posts_template_name, page)
+
+    async def get(self, request):
+        cursor = request.GET.get("cursor")
+        content = await cache.aget_or_render_page(
+            "posts", request.user, cursor, lambda: self.render_page(request, cursor))
+        return HttpResponse(content)
+
+
+class FollowerAddView(AsyncLoginRequiredMixin, View):
+    template_name = views.FollowerAddView.template_name
+
+    async def get(self, request):
+        users_links = await sync_to_async(follows.get_follows)(request.user)
+        return await sync_to_async(render)(request, self.template_name, context=users_links)
+
+    async def post(self, request):
+        usernames = views.parse_usernames(request.POST.get("username", ""))
+        _, already_followed, unknown = await sync_to_async(follows.follow)(request.user, usernames)
+        message = views.follow_messages(request.user, usernames, already_followed, unknown)
+        if not message:
+            return redirect("add-follower")
+        users_links = await sync_to_async(follows.get_follows)(request.user)
+        return await sync_to_async(render)(request, self.template_name, context={"message": message, **users_links})
+
+
+class EventStreamView(AsyncLoginRequiredMixin, View):
+    # server-sent events of the new posts of the home feed of the user
+
+    async def stream(self, user_id):
+        subscription = events.broker.subscribe(user_id)
+        deadline = time.monotonic() + settings.SSE_MAX_DURATION
+        try:
+            yield f"retry: {settings.SSE_HEARTBEAT * 1000}\n\n"
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), min(settings.SSE_HEARTBEAT, remaining))
+                except asyncio.TimeoutError:
+                    # keeps proxies from closing an idle connection
+                    yield ": heartbeat\n\n"
+                    continue
+                if event is None:
+                    break
+                yield events.format_event(event)
+        finally:
+            events.broker.unsubscribe(subscription)
+
+    async def get(self, request):
+        response = StreamingHttpResponse(self.stream(request.user.id), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
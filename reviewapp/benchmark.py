@@ -0,0 +1,125 @@
+import random
+import time
+import tracemalloc
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from authentication.models import User
+from litreview.instrumentation import percentile
+from . import models, ratings, timeline
+
+BATCH_SIZE = 1000
+
+
+def generate_data(users, follows, tickets, reviews, seed=0):
+    # reviews are spread over distinct tickets, one review per ticket like the application allows
+    rng = random.Random(seed)
+    password = make_password("1234Aze!")
+    User.objects.bulk_create(
+        [User(username=f"bench_{index}", username_search=f"bench_{index}", password=password)
+         for index in range(users)], batch_size=BATCH_SIZE)
+    user_ids = list(User.objects.filter(username__startswith="bench_").values_list("id", flat=True))
+
+    links = []
+    for user_id in user_ids:
+        for followed_user_id in rng.sample(user_ids, min(follows + 1, len(user_ids))):
+            if followed_user_id != user_id:
+                links.append(models.UserFollows(user_id=user_id, followed_user_id=followed_user_id))
+    models.UserFollows.objects.bulk_create(links, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+    models.Ticket.objects.bulk_create(
+        [models.Ticket(title=f"Livre {index}", description="Description " * 10, user_id=rng.choice(user_ids))
+         for index in range(tickets)], batch_size=BATCH_SIZE)
+    ticket_ids = list(models.Ticket.objects.filter(user_id__in=user_ids).values_list("id", flat=True))
+    models.Review.objects.bulk_create(
+        [models.Review(ticket_id=ticket_id, rating=rng.randint(0, 5), headline=f"Critique {index}",
+                       body="Commentaire " * 50, user_id=rng.choice(user_ids))
+         for index, ticket_id in enumerate(rng.sample(ticket_ids, min(reviews, len(ticket_ids))))],
+        batch_size=BATCH_SIZE)
+    # bulk_create sends no signal, the timelines and the ticket aggregates are built once at the end
+    timeline.rebuild()
+    ratings.reconcile()
+    return user_ids
+
+
+def get_scenarios(rng, user):
+    # (name, method, url, data) of every benchmarked request made by the given user
+    ticket = models.Ticket.objects.filter(user=user).first() or models.Ticket.objects.create(title="Livre", user=user)
+    review = models.Review.objects.filter(user=user).first()
+    # drawn from the seeded generator so that runs with the same seed follow the same users
+    other_users = User.objects.exclude(id=user.id).order_by("id")
+    other_user = other_users[rng.randrange(other_users.count())]
+    ticket_data = {"title": f"Livre {rng.random()}", "description": "Description"}
+    review_data = {"headline": "Critique", "rating": "4", "body": "Commentaire"}
+    scenarios = [
+        ("home", "get", reverse("home"), None),
+        ("posts", "get", reverse("posts"), None),
+        ("add-follower", "get", reverse("add-follower"), None),
+        ("add-follower:post", "post", reverse("add-follower"), {"username": other_user.username}),
+        ("ticket-create", "get", reverse("ticket-create"), None),
+        ("ticket-create:post", "post", reverse("ticket-create"), ticket_data),
+        ("review-ticket-create:post", "post", reverse("review-ticket-create"), {**ticket_data, **review_data}),
+        ("update-ticket", "get", reverse("update-ticket", args=[ticket.id]), None),
+        ("update-ticket:post", "post", reverse("update-ticket", args=[ticket.id]), ticket_data),
+    ]
+    if review:
+        scenarios += [
+            ("update-review", "get", reverse("update-review", args=[review.id]), None),
+            ("update-review:post", "post", reverse("update-review", args=[review.id]), review_data),
+        ]
+    return scenarios
+
+
+def measure(client, method, url, data, warm_cache):
+    if not warm_cache:
+        cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        start = time.perf_counter()
+        getattr(client, method)(url, data)
+        duration = time.perf_counter() - start
+    return duration, len(context.captured_queries)
+
+
+def run(user_ids, iterations, memory_iterations, warm_cache=False, seed=0):
+    rng = random.Random(seed)
+    client = Client()
+    samples = {}
+    for _ in range(iterations):
+        user = User.objects.get(id=rng.choice(user_ids))
+        client.force_login(user)
+        for name, method, url, data in get_scenarios(rng, user):
+            duration, queries = measure(client, method, url, data, warm_cache)
+            sample = samples.setdefault(name, {"durations": [], "queries": [], "memory": []})
+            sample["durations"].append(duration)
+            sample["queries"].append(queries)
+
+    # tracemalloc slows every allocation down, memory is measured apart from latency
+    tracemalloc.start()
+    for _ in range(memory_iterations):
+        user = User.objects.get(id=rng.choice(user_ids))
+        client.force_login(user)
+        for name, method, url, data in get_scenarios(rng, user):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            measure(client, method, url, data, warm_cache)
+            samples[name]["memory"].append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    for sample in samples.values():
+        sample["durations"].sort()
+        sample["queries"].sort()
+    return {
+        name: {
+            "requests": len(sample["durations"]),
+            "p50_ms": round(percentile(sample["durations"], 50) * 1000, 2),
+            "p99_ms": round(percentile(sample["durations"], 99) * 1000, 2),
+            "queries_p50": percentile(sample["queries"], 50),
+            "queries_max": sample["queries"][-1],
+            "memory_peak_kb": round(max(sample["memory"], default=0) / 1024, 1),
+        }
+        for name, sample in samples.items()}
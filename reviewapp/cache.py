@@ -0,0 +1,113 @@
+import hashlib
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.template import engines
+from django.template.loader import render_to_string
+
+from .feed import REVIEW, TICKET
+
+SNIPPET_TEMPLATES = {
+    TICKET: 'reviewapp/ticket_snippet.html',
+    REVIEW: 'reviewapp/review_snippet.html',
+}
+# macros of reviewapp/macros.html rendering the snippets of the Jinja2 feed
+SNIPPET_MACROS = {
+    TICKET: 'ticket_snippet',
+    REVIEW: 'review_snippet',
+}
+
+# hit/miss counters of the current process
+stats = Counter()
+
+
+def snippet_key(post, user):
+    # a snippet only depends on the post, its authors and whether the viewer is one of them,
+    # the review aggregates of a ticket change without its time_updated
+    if post.content_type == TICKET:
+        return (
+            f"snippet:ticket:{post.id}:{post.time_updated.timestamp()}:{post.user}:{post.user_id == user.id}:"
+            f"{post.review_count}:{post.rating_sum}")
+    return (
+        f"snippet:review:{post.id}:{post.time_updated.timestamp()}:{post.user}:{post.user_id == user.id}:"
+        f"{post.ticket.time_updated.timestamp()}:{post.ticket.user}:{post.ticket.user_id == user.id}")
+
+
+def render_snippet(post, user):
+    if settings.JINJA2_FEED:
+        # the template module, and its macros, are built once and kept with the compiled template
+        macros = engines["jinja2"].env.get_template("reviewapp/macros.html").module
+        return getattr(macros, SNIPPET_MACROS[post.content_type])(post, user)
+    return render_to_string(SNIPPET_TEMPLATES[post.content_type], {"post": post, "user": user})
+
+
+def render_snippets(posts, user):
+    keys = {snippet_key(post, user): post for post in posts}
+    snippets = cache.get_many(keys)
+    stats["snippet_hits"] += len(snippets)
+    stats["snippet_misses"] += len(keys) - len(snippets)
+    rendered = {}
+    for key, post in keys.items():
+        if key not in snippets:
+            rendered[key] = render_snippet(post, user)
+        post.snippet = snippets[key] if key in snippets else rendered[key]
+    cache.set_many(rendered, settings.SNIPPET_CACHE_TIMEOUT)
+    return posts
+
+
+def feed_version_key(user_id):
+    return f"feed-version:{user_id}"
+
+
+def get_feed_version(user_id):
+    # random versions so that a reused user id never matches pages cached before, prefixed with their
+    # creation time which is the last time the feed changed, they expire with the pages so that the other
+    # processes of local memory caches see the changes after FEED_CACHE_TIMEOUT seconds
+    key = feed_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, f"{int(time.time())}-{uuid.uuid4().hex}", settings.FEED_CACHE_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def get_version_time(version):
+    return datetime.fromtimestamp(int(version.split("-", 1)[0]), timezone.utc)
+
+
+def invalidate_feeds(user_ids):
+    cache.delete_many([feed_version_key(user_id) for user_id in user_ids])
+
+
+def page_key(name, user, cursor):
+    cursor_key = hashlib.md5(cursor.encode()).hexdigest() if cursor else "first"
+    return f"page:{name}:{user.id}:{get_feed_version(user.id)}:{cursor_key}"
+
+
+def get_or_render_page(name, user, cursor, render, timeout=None):
+    key = page_key(name, user, cursor)
+    content = cache.get(key)
+    if content is None:
+        stats["page_misses"] += 1
+        content = render()
+        cache.set(key, content, timeout or settings.FEED_CACHE_TIMEOUT)
+    else:
+        stats["page_hits"] += 1
+    return content
+
+
+async def aget_or_render_page(name, user, cursor, render):
+    key = await sync_to_async(page_key)(name, user, cursor)
+    content = await cache.aget(key)
+    if content is None:
+        stats["page_misses"] += 1
+        content = await render()
+        await cache.aset(key, content, settings.FEED_CACHE_TIMEOUT)
+    else:
+        stats["page_hits"] += 1
+    return content
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+from . import feed
+
+
+class Subscription:
+    def __init__(self, user_id, queue_size):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def put(self, event):
+        # runs in the event loop of the connection, a client that does not keep up is dropped
+        # rather than buffering events without bound, None ends its stream
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class Broker:
+    # in-process publish/subscribe of the new posts, every server process only reaches its own connections
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, self.queue_size)
+        with self.lock:
+            self.subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions[subscription.user_id].discard(subscription)
+            if not self.subscriptions[subscription.user_id]:
+                del self.subscriptions[subscription.user_id]
+
+    def publish(self, user_ids, event):
+        # may be called from any thread, the event is handed to the loop of every connection
+        with self.lock:
+            subscriptions = [
+                subscription for user_id in user_ids for subscription in self.subscriptions.get(user_id, ())]
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # the loop is closed, its connections are gone
+                self.unsubscribe(subscription)
+
+
+broker = Broker(settings.SSE_QUEUE_SIZE)
+
+
+def post_event(post, content_type):
+    if content_type == feed.TICKET:
+        return {"type": "ticket", "id": post.id, "title": post.title, "user": post.user.username,
+                "time_created": post.time_created.isoformat()}
+    return {"type": "review", "id": post.id, "headline": post.headline, "user": post.user.username,
+            "time_created": post.time_created.isoformat()}
+
+
+def format_event(event):
+    return f"event: post\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,185 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import CharField, Q, Value
+
+from . import models
+
+TICKET = 'TICKET'
+REVIEW = 'REVIEW'
+
+
+class FeedPage:
+    def __init__(self, posts, next_cursor=None, since_cursor=None):
+        self.posts = posts
+        self.next_cursor = next_cursor
+        # cursor of the newest post of a timeline page, to poll for the posts created after it
+        self.since_cursor = since_cursor
+
+
+def encode_cursor(time_created, *keys):
+    raw = "|".join([time_created.isoformat(), *[str(key) for key in keys]])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, size):
+    # returns (time_created, *keys, id), an invalid cursor restarts the feed from its first page
+    if not cursor:
+        return None
+    try:
+        time_created, *keys, last_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        if len(keys) != size - 2:
+            return None
+        return datetime.fromisoformat(time_created), *keys, int(last_id)
+    except (ValueError, binascii.Error, UnicodeError):
+        return None
+
+
+def get_feed_tickets():
+    # fetches everything the snippet templates read so rendering a page runs no extra query,
+    # whether a ticket was reviewed comes from its review_count column
+    tickets = models.Ticket.objects.select_related('user')
+    return tickets
+
+
+def get_feed_reviews():
+    reviews = models.Review.objects.select_related('user', 'ticket__user')
+    return reviews
+
+
+def after_cursor(content_type, cursor):
+    # posts are ordered by (time_created, content_type, id) descending, the content type
+    # only breaks ties between a ticket and a review created at the same instant
+    if cursor is None:
+        return Q()
+    time_created, cursor_type, post_id = cursor
+    if content_type > cursor_type:
+        return Q(time_created__lt=time_created)
+    if content_type < cursor_type:
+        return Q(time_created__lte=time_created)
+    return Q(time_created__lt=time_created) | Q(time_created=time_created, id__lt=post_id)
+
+
+def get_feed_keys(ticket_filter, review_filter, cursor, page_size):
+    # (time_created, content_type, id) of the posts of the page, plus one telling if a next page exists
+    cursor = decode_cursor(cursor, 3)
+    tickets = models.Ticket.objects.filter(ticket_filter, after_cursor(TICKET, cursor))
+    tickets = tickets.annotate(content_type=Value(TICKET, CharField()))
+    reviews = models.Review.objects.filter(review_filter, after_cursor(REVIEW, cursor))
+    reviews = reviews.annotate(content_type=Value(REVIEW, CharField()))
+    keys = tickets.values_list('time_created', 'content_type', 'id')\
+        .union(reviews.values_list('time_created', 'content_type', 'id'))\
+        .order_by('-time_created', '-content_type', '-id')
+    return keys[:page_size + 1]
+
+
+def get_post_ids(keys, content_type):
+    return [post_id for _, key_type, post_id in keys if key_type == content_type]
+
+
+def make_feed_page(keys, tickets, reviews, page_size):
+    next_cursor = encode_cursor(*keys[page_size - 1]) if len(keys) > page_size else None
+    instances = {TICKET: tickets, REVIEW: reviews}
+    posts = []
+    for _, content_type, post_id in keys[:page_size]:
+        post = instances[content_type][post_id]
+        post.content_type = content_type
+        posts.append(post)
+    return FeedPage(posts, next_cursor)
+
+
+def build_feed(ticket_filter, review_filter, cursor=None, page_size=None):
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    keys = list(get_feed_keys(ticket_filter, review_filter, cursor, page_size))
+    tickets = get_feed_tickets().in_bulk(get_post_ids(keys[:page_size], TICKET))
+    reviews = get_feed_reviews().in_bulk(get_post_ids(keys[:page_size], REVIEW))
+    return make_feed_page(keys, tickets, reviews, page_size)
+
+
+async def abuild_feed(ticket_filter, review_filter, cursor=None, page_size=None):
+    # the ORM runs its queries one after the other in the thread of the request, awaited in turn
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    keys = [key async for key in get_feed_keys(ticket_filter, review_filter, cursor, page_size)]
+    tickets = await get_feed_tickets().ain_bulk(get_post_ids(keys[:page_size], TICKET))
+    reviews = await get_feed_reviews().ain_bulk(get_post_ids(keys[:page_size], REVIEW))
+    return make_feed_page(keys, tickets, reviews, page_size)
+
+
+def get_timeline_entries(user):
+    entries = models.FeedEntry.objects.filter(owner=user)
+    entries = entries.select_related('ticket__user', 'review__user', 'review__ticket__user')
+    return entries
+
+
+def entry_post(entry):
+    if entry.review_id:
+        post = entry.review
+        post.content_type = REVIEW
+    else:
+        post = entry.ticket
+        post.content_type = TICKET
+    return post
+
+
+def get_timeline_page_entries(user, cursor, page_size):
+    # entries of the page, ordered by their (time_created, id), plus one telling if a next page exists
+    cursor = decode_cursor(cursor, 2)
+    entries = get_timeline_entries(user)
+    if cursor is not None:
+        time_created, entry_id = cursor
+        entries = entries.filter(Q(time_created__lt=time_created) | Q(time_created=time_created, id__lt=entry_id))
+    return entries.order_by('-time_created', '-id')[:page_size + 1]
+
+
+def entry_cursor(entry):
+    return encode_cursor(entry.time_created, entry.id)
+
+
+def make_timeline_page(entries, page_size):
+    next_cursor = entry_cursor(entries[page_size - 1]) if len(entries) > page_size else None
+    since_cursor = entry_cursor(entries[0]) if entries else None
+    return FeedPage([entry_post(entry) for entry in entries[:page_size]], next_cursor, since_cursor)
+
+
+def after_since(since):
+    time_created, entry_id = since
+    return Q(time_created__gt=time_created) | Q(time_created=time_created, id__gt=entry_id)
+
+
+def new_posts(user, since, page_size=None):
+    # the page_size oldest entries created after the since cursor, a range of the (owner, time_created, id)
+    # index, returned newest first with the cursor of the newest of them and whether more follow
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    entries = get_timeline_entries(user).filter(after_since(since)).order_by('time_created', 'id')
+    entries = list(entries[:page_size + 1])
+    has_more = len(entries) > page_size
+    entries = entries[:page_size]
+    since_cursor = entry_cursor(entries[-1]) if entries else encode_cursor(*since)
+    return FeedPage([entry_post(entry) for entry in reversed(entries)], since_cursor=since_cursor), has_more
+
+
+def count_new_posts(user, since):
+    return models.FeedEntry.objects.filter(after_since(since), owner=user).count()
+
+
+def timeline_feed(user, cursor=None, page_size=None):
+    # reads the materialized timeline
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    entries = list(get_timeline_page_entries(user, cursor, page_size))
+    return make_timeline_page(entries, page_size)
+
+
+async def atimeline_feed(user, cursor=None, page_size=None):
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    entries = [entry async for entry in get_timeline_page_entries(user, cursor, page_size)]
+    return make_timeline_page(entries, page_size)
+
+
+def user_posts(user, cursor=None, page_size=None):
+    return build_feed(Q(user=user), Q(user=user), cursor, page_size)
+
+
+async def auser_posts(user, cursor=None, page_size=None):
+    return await abuild_feed(Q(user=user), Q(user=user), cursor, page_size)
@@ -0,0 +1,144 @@
+import difflib
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from authentication.models import User
+from . import cache as feed_cache, models, timeline
+
+# minimum difflib similarity of the close usernames
+FUZZY_RATIO = 0.7
+
+
+def version_key(user_id):
+    return f"follows-version:{user_id}"
+
+
+def get_version(user_id):
+    # bumped whenever the user follows, unfollows, or gains or loses a follower, and expires with the follow sets
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, settings.FEED_CACHE_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def invalidate(user_ids):
+    cache.delete_many([version_key(user_id) for user_id in user_ids])
+
+
+def get_ids(name, user_id, queryset, field):
+    key = f"{name}:{user_id}:{get_version(user_id)}"
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(queryset.values_list(field, flat=True))
+        cache.set(key, ids, settings.FEED_CACHE_TIMEOUT)
+    return ids
+
+
+def get_following_ids(user_id):
+    return get_ids("following", user_id, models.UserFollows.objects.filter(user_id=user_id), "followed_user_id")
+
+
+def get_follower_ids(user_id):
+    return get_ids("followers", user_id, models.UserFollows.objects.filter(followed_user_id=user_id), "user_id")
+
+
+def get_follows(user):
+    # followed users and followers sorted by username, their users are fetched in a single query
+    following_ids = get_following_ids(user.id)
+    follower_ids = get_follower_ids(user.id)
+    users = User.objects.filter(id__in=following_ids | follower_ids).order_by("username")
+    return {
+        "subscriptions": [other_user for other_user in users if other_user.id in following_ids],
+        "subscribers": [other_user for other_user in users if other_user.id in follower_ids],
+    }
+
+
+def changed(user_id, other_user_ids):
+    # bulk statements send no signal, the timeline and the caches are updated here
+    feed_cache.invalidate_feeds([user_id])
+    invalidate([user_id, *other_user_ids])
+
+
+def follow(user, usernames):
+    # returns the followed users, the usernames already followed and the unknown ones
+    users = {other_user.username: other_user for other_user in User.objects.filter(username__in=usernames)}
+    following_ids = get_following_ids(user.id)
+    new_users = [
+        other_user for other_user in users.values() if other_user.id not in following_ids and other_user != user]
+    already_followed = sorted(username for username, other_user in users.items() if other_user.id in following_ids)
+    unknown = sorted(set(usernames) - set(users))
+    if new_users:
+        new_user_ids = [other_user.id for other_user in new_users]
+        with transaction.atomic():
+            models.UserFollows.objects.bulk_create(
+                [models.UserFollows(user=user, followed_user_id=user_id) for user_id in new_user_ids],
+                ignore_conflicts=True)
+            timeline.add_follows(user.id, new_user_ids)
+        changed(user.id, new_user_ids)
+    return new_users, already_followed, unknown
+
+
+def unfollow(user, user_ids):
+    # the follows are removed in a single DELETE statement, which sends no signal like the bulk_create of follow,
+    # returns the number of follows removed
+    with transaction.atomic():
+        removed = dict(models.UserFollows.objects.filter(user=user, followed_user_id__in=user_ids)
+                       .values_list("id", "followed_user_id"))
+        if not removed:
+            return 0
+        table = connection.ops.quote_name(models.UserFollows._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(removed))})", list(removed))
+        removed_user_ids = list(removed.values())
+        timeline.remove_follows(user.id, removed_user_ids)
+    changed(user.id, removed_user_ids)
+    return len(removed)
+
+
+def prefix_range(prefix):
+    # a range on the case-folded username index, LIKE is case-insensitive in SQLite and would scan the table
+    return {"username_search__gte": prefix, "username_search__lt": prefix + "\U0010ffff"}
+
+
+def fuzzy_usernames(query, limit, exclude):
+    # close usernames among those sharing the first letter of the query, within a candidate and a time budget
+    deadline = time.monotonic() + settings.USER_SEARCH_TIME_BUDGET
+    candidates = User.objects.filter(**prefix_range(query[0])).exclude(username__in=exclude)
+    candidates = candidates.values_list("username", "username_search")[:settings.USER_SEARCH_FUZZY_CANDIDATES]
+    matcher = difflib.SequenceMatcher(b=query)
+    matches = []
+    for username, username_search in candidates:
+        if time.monotonic() > deadline:
+            break
+        matcher.set_seq1(username_search)
+        # the cheap upper bounds discard most candidates before the full comparison
+        if matcher.real_quick_ratio() < FUZZY_RATIO or matcher.quick_ratio() < FUZZY_RATIO:
+            continue
+        ratio = matcher.ratio()
+        if ratio >= FUZZY_RATIO:
+            matches.append((ratio, username))
+    return [username for _, username in sorted(matches, key=lambda match: (-match[0], match[1]))[:limit]]
+
+
+def search_usernames(query):
+    # usernames starting with the query, completed by the closest ones, cached for every query
+    query = query.strip().casefold()
+    if not query:
+        return []
+    key = f"user-search:{hashlib.md5(query.encode()).hexdigest()}"
+    usernames = cache.get(key)
+    if usernames is None:
+        limit = settings.USER_SEARCH_LIMIT
+        usernames = list(User.objects.filter(**prefix_range(query)).order_by("username_search")
+                         .values_list("username", flat=True)[:limit])
+        if len(usernames) < limit and len(query) >= settings.USER_SEARCH_FUZZY_MIN_LENGTH:
+            usernames += fuzzy_usernames(query, limit - len(usernames), usernames)
+        cache.set(key, usernames, settings.USER_SEARCH_CACHE_TIMEOUT)
+    return usernames
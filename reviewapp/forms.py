@@ -1,10 +1,14 @@
 from string import Template
 
 from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 from django.utils.safestring import mark_safe
+from PIL import Image
 
-from litreview import settings
 from reviewapp.models import Ticket, Review
+from reviewapp.uploads import downscale
 
 
 class PictureWidget(forms.widgets.FileInput):
@@ -23,14 +27,52 @@ class PictureWidget(forms.widgets.FileInput):
         return mark_safe(html.substitute(media=settings.MEDIA_URL, link=value))
 
 
+class BoundedImageField(forms.ImageField):
+    # checks size and dimensions from the image header only, Pillow never decodes a rejected upload
+    default_error_messages = {
+        "file_too_large": "L'image ne doit pas dépasser %(max_size)s Mo.",
+        "too_many_pixels": "L'image ne doit pas dépasser %(max_pixels)s mégapixels.",
+    }
+
+    def to_python(self, data):
+        file = forms.FileField.to_python(self, data)
+        if file is None:
+            return None
+        if file.size > settings.IMAGE_UPLOAD_MAX_SIZE:
+            raise ValidationError(
+                self.error_messages["file_too_large"], code="file_too_large",
+                params={"max_size": settings.IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)})
+        file.seek(0)
+        source = file.temporary_file_path() if hasattr(file, "temporary_file_path") else file
+        try:
+            with Image.open(source) as image:
+                width, height = image.size
+                image_format = image.format
+        except (Image.DecompressionBombError, OSError, SyntaxError, ValueError) as error:
+            raise ValidationError(self.error_messages["invalid_image"], code="invalid_image") from error
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                self.error_messages["too_many_pixels"], code="too_many_pixels",
+                params={"max_pixels": settings.IMAGE_MAX_PIXELS // 1_000_000})
+        if max(width, height) > settings.IMAGE_MAX_DIMENSION:
+            file.seek(0)
+            output, size = downscale(source, image_format, settings.IMAGE_MAX_DIMENSION)
+            file = UploadedFile(output, file.name, file.content_type, size, file.charset)
+        file.content_type = Image.MIME.get(image_format)
+        file.seek(0)
+        return file
+
+
 class TicketForm(forms.ModelForm):
+    image = BoundedImageField(required=False)
+
     class Meta:
         model = Ticket
         fields = ['title', 'description', 'image']
 
 
 class UpdateTicketWithImageForm(forms.ModelForm):
-    image = forms.ImageField(widget=PictureWidget)
+    image = BoundedImageField(widget=PictureWidget)
 
     class Meta:
         model = Ticket
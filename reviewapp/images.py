@@ -0,0 +1,104 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.dispatch import Signal
+from django.utils.functional import cached_property
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# extension -> Pillow format of the derivatives generated for every width
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+
+class DerivativesStorage(FileSystemStorage):
+    # MEDIA_ROOT/THUMBNAIL_DIR, read from the settings like the default storage so that it follows their changes
+
+    @cached_property
+    def base_location(self):
+        return os.path.join(settings.MEDIA_ROOT, settings.THUMBNAIL_DIR)
+
+    @cached_property
+    def base_url(self):
+        return f"{settings.MEDIA_URL}{settings.THUMBNAIL_DIR}/"
+
+
+derivatives_storage = DerivativesStorage()
+
+executor = ThreadPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS, thread_name_prefix="thumbnails")
+
+# sent with the name of an image once its derivatives are written, the cached snippets showing it change then
+derivatives_generated = Signal()
+
+
+def derivative_name(name, width, extension):
+    path = PurePosixPath(name)
+    return str(path.parent / f"{path.stem}_w{width}.{extension}")
+
+
+def derivative_names(name):
+    return [
+        derivative_name(name, width, extension)
+        for width in settings.THUMBNAIL_WIDTHS for extension in FORMATS]
+
+
+def has_derivatives(name):
+    return all(derivatives_storage.exists(derivative) for derivative in derivative_names(name))
+
+
+def generate_derivatives(name):
+    with Image.open(default_storage.path(name)) as original:
+        # lets JPEG decode straight at a reduced scale instead of the full resolution
+        largest = max(settings.THUMBNAIL_WIDTHS)
+        original.draft('RGB', (largest, largest * original.height // original.width))
+        image = ImageOps.exif_transpose(original).convert('RGB')
+    for width in settings.THUMBNAIL_WIDTHS:
+        # never upscales, small originals are only re-encoded
+        resized = image
+        if image.width > width:
+            resized = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        for extension, image_format in FORMATS.items():
+            path = derivatives_storage.path(derivative_name(name, width, extension))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # written aside then renamed so a feed never serves a half written file
+            resized.save(f"{path}.tmp", image_format, quality=settings.THUMBNAIL_QUALITY)
+            os.replace(f"{path}.tmp", path)
+    return name
+
+
+def build_derivatives(name):
+    generate_derivatives(name)
+    derivatives_generated.send(sender=None, name=name)
+    return name
+
+
+def log_failure(name, future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Derivatives of %s could not be generated", name, exc_info=future.exception())
+
+
+def queue_derivatives(name):
+    # nobody waits for the result, failures are only logged and build_thumbnails generates them later
+    future = executor.submit(build_derivatives, name)
+    future.add_done_callback(partial(log_failure, name))
+    return future
+
+
+def delete_derivatives(name):
+    for derivative in derivative_names(name):
+        derivatives_storage.delete(derivative)
+
+
+def srcset(name, extension):
+    # only the derivatives already generated, empty until then so that the original is served
+    candidates = []
+    for width in settings.THUMBNAIL_WIDTHS:
+        derivative = derivative_name(name, width, extension)
+        if derivatives_storage.exists(derivative):
+            candidates.append(f"{derivatives_storage.url(derivative)} {width}w")
+    return ", ".join(candidates)
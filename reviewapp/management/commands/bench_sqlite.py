@@ -0,0 +1,123 @@
+import json
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+# database settings of the stock Django SQLite backend and of the production profile
+PROFILES = {
+    "default": {"ENGINE": "django.db.backends.sqlite3", "OPTIONS": {"timeout": 5}},
+    "tuned": settings.SQLITE_PRODUCTION_PROFILE,
+}
+USERS = 100
+
+
+@contextmanager
+def database(directory, name):
+    # registers a throwaway database with the settings of the profile, the statements then go through
+    # the backend of the profile like those of the application
+    alias = f"bench_sqlite_{name}"
+    configured = connections.configure_settings(
+        {DEFAULT_DB_ALIAS: {**PROFILES[name], "NAME": str(Path(directory) / f"{name}.sqlite3")}})
+    connections.settings[alias] = configured[DEFAULT_DB_ALIAS]
+    try:
+        yield alias
+    finally:
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+
+def create_database(alias, rows):
+    with connections[alias].cursor() as cursor:
+        cursor.execute("CREATE TABLE ticket (id INTEGER PRIMARY KEY, user_id INTEGER, title TEXT, time_created REAL)")
+        cursor.execute("CREATE INDEX ticket_user_time ON ticket (user_id, time_created DESC)")
+    with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO ticket (user_id, title, time_created) VALUES (%s, %s, %s)",
+            [(random.randrange(USERS), f"Ticket {index}", time.time()) for index in range(rows)])
+
+
+def read(alias, counters, deadline):
+    while time.monotonic() < deadline:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(
+                    "SELECT * FROM ticket WHERE user_id = %s ORDER BY time_created DESC LIMIT 20",
+                    [random.randrange(USERS)])
+                cursor.fetchall()
+            counters["reads"] += 1
+        except OperationalError:
+            counters["errors"] += 1
+
+
+def write(alias, counters, deadline):
+    while time.monotonic() < deadline:
+        try:
+            with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO ticket (user_id, title, time_created) VALUES (%s, %s, %s)",
+                    [random.randrange(USERS), "Nouveau ticket", time.time()])
+            counters["writes"] += 1
+        except OperationalError:
+            counters["errors"] += 1
+
+
+def work(target, alias, counters, deadline):
+    # every thread opens its own connection
+    try:
+        target(alias, counters, deadline)
+    finally:
+        connections[alias].close()
+
+
+def run_profile(directory, name, readers, writers, duration, rows):
+    with database(directory, name) as alias:
+        create_database(alias, rows)
+        workers = [(read, {"reads": 0, "errors": 0}) for _ in range(readers)]
+        workers += [(write, {"writes": 0, "errors": 0}) for _ in range(writers)]
+        deadline = time.monotonic() + duration
+        threads = [
+            threading.Thread(target=work, args=(target, alias, counters, deadline))
+            for target, counters in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return {
+        "reads_per_second": round(sum(counters.get("reads", 0) for _, counters in workers) / duration, 1),
+        "writes_per_second": round(sum(counters.get("writes", 0) for _, counters in workers) / duration, 1),
+        "lock_errors": sum(counters["errors"] for _, counters in workers),
+    }
+
+
+class Command(BaseCommand):
+    help = "Measures concurrent read/write throughput of SQLite with the default and the production database settings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--duration", type=float, default=5.0, help="Seconds per profile.")
+        parser.add_argument("--rows", type=int, default=10000, help="Rows created before the run.")
+        parser.add_argument("--json", action="store_true", help="Prints the results as JSON.")
+
+    def handle(self, *args, **options):
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for name in PROFILES:
+                results[name] = run_profile(
+                    directory, name, options["readers"], options["writers"], options["duration"], options["rows"])
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'profile':<10}{'reads/s':>12}{'writes/s':>12}{'lock errors':>14}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<10}{result['reads_per_second']:>12}{result['writes_per_second']:>12}"
+                f"{result['lock_errors']:>14}")
@@ -0,0 +1,75 @@
+import json
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from authentication.models import User
+from litreview.instrumentation import percentile
+from reviewapp import benchmark, feed, views
+
+ENGINES = {"django": False, "jinja2": True}
+PAGES = {"home": views.Home, "posts": views.Posts}
+
+
+def measure(request, view, page, iterations, warm):
+    # milliseconds per 100 posts, cold renders start without any cached snippet
+    durations = []
+    for _ in range(iterations):
+        if not warm:
+            cache.clear()
+        start = time.perf_counter()
+        views.render_feed_page(request, view.template_name, view.posts_template_name, page)
+        durations.append(time.perf_counter() - start)
+    return round(percentile(sorted(durations), 50) * 1000 * 100 / max(len(page.posts), 1), 2)
+
+
+class Command(BaseCommand):
+    help = "Compares the render time of the feed and posts pages with the Django and the Jinja2 templates."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=100, help="Posts rendered per page.")
+        parser.add_argument("--iterations", type=int, default=50, help="Renders per page and engine.")
+        parser.add_argument("--json", action="store_true", help="Prints the results as JSON.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        databases = setup_databases(verbosity=0, interactive=False)
+        try:
+            # every user follows the others so that a single timeline holds all the posts
+            user_ids = benchmark.generate_data(10, 9, options["posts"], options["posts"] // 2)
+            user = User.objects.get(id=user_ids[0])
+            request = RequestFactory().get("/")
+            request.user = user
+            pages = {
+                "home": feed.timeline_feed(user, page_size=options["posts"]),
+                "posts": feed.user_posts(user, page_size=options["posts"]),
+            }
+            results = {}
+            # templates are compiled and cached like in production, outside of DEBUG
+            with override_settings(DEBUG=False):
+                for engine, jinja2_feed in ENGINES.items():
+                    with override_settings(JINJA2_FEED=jinja2_feed):
+                        for name, view in PAGES.items():
+                            # the first render compiles the templates
+                            views.render_feed_page(request, view.template_name, view.posts_template_name, pages[name])
+                            results[f"{name}:{engine}"] = {
+                                "posts": len(pages[name].posts),
+                                "cold_ms_per_100": measure(
+                                    request, view, pages[name], options["iterations"], False),
+                                "warm_ms_per_100": measure(
+                                    request, view, pages[name], options["iterations"], True),
+                            }
+        finally:
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'page':<16}{'posts':>7}{'cold ms/100':>13}{'warm ms/100':>13}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<16}{result['posts']:>7}{result['cold_ms_per_100']:>13}{result['warm_ms_per_100']:>13}")
@@ -0,0 +1,74 @@
+import json
+import subprocess
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from reviewapp import benchmark
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Benchmarks every LitReview page on generated data in a throwaway test database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--follows", type=int, default=20, help="Users followed by every user.")
+        parser.add_argument("--tickets", type=int, default=5000)
+        parser.add_argument("--reviews", type=int, default=3000)
+        parser.add_argument("--iterations", type=int, default=30, help="Requests per page for latency and queries.")
+        parser.add_argument("--memory-iterations", type=int, default=3, help="Requests per page for memory.")
+        parser.add_argument("--warm-cache", action="store_true", help="Keeps the cache between requests.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="JSON file the results are written to.")
+        parser.add_argument("--compare", help="JSON file of a previous run to compare with.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        databases = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.stdout.write("Generating data...")
+            user_ids = benchmark.generate_data(
+                options["users"], options["follows"], options["tickets"], options["reviews"], options["seed"])
+            self.stdout.write("Running requests...")
+            results = benchmark.run(
+                user_ids, options["iterations"], options["memory_iterations"], options["warm_cache"], options["seed"])
+        finally:
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            "commit": get_commit(),
+            "date": datetime.now(timezone.utc).isoformat(),
+            "parameters": {key: options[key] for key in (
+                "users", "follows", "tickets", "reviews", "iterations", "memory_iterations", "warm_cache", "seed")},
+            "results": results,
+        }
+        previous = {}
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                previous = json.load(file)["results"]
+        self.print_results(results, previous)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
+
+    def print_results(self, results, previous):
+        self.stdout.write(f"{'page':<28}{'p50 ms':>10}{'p99 ms':>10}{'queries':>9}{'memory kB':>11}")
+        for name, result in results.items():
+            line = (
+                f"{name:<28}{result['p50_ms']:>10}{result['p99_ms']:>10}"
+                f"{result['queries_max']:>9}{result['memory_peak_kb']:>11}")
+            if name in previous and previous[name]["p50_ms"]:
+                change = (result["p50_ms"] - previous[name]["p50_ms"]) / previous[name]["p50_ms"] * 100
+                line += f"  p50 {change:+.0f}%, queries {result['queries_max'] - previous[name]['queries_max']:+d}"
+            self.stdout.write(line)
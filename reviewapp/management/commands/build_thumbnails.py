@@ -0,0 +1,30 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from reviewapp import images, models
+
+
+class Command(BaseCommand):
+    help = "Generates the missing thumbnails and WebP variants of ticket images in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Number of processes, one per CPU by default.")
+        parser.add_argument("--force", action="store_true", help="Regenerates the existing derivatives too.")
+
+    def handle(self, *args, **options):
+        names = models.Ticket.objects.exclude(image="").exclude(image__isnull=True)\
+            .values_list("image", flat=True).distinct()
+        names = [name for name in names.iterator() if options["force"] or not images.has_derivatives(name)]
+        failures = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+            futures = {executor.submit(images.generate_derivatives, name): name for name in names}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    images.derivatives_generated.send(sender=None, name=futures[future])
+                    self.stdout.write(f"{futures[future]}")
+                except (OSError, ValueError) as error:
+                    failures += 1
+                    self.stderr.write(f"{futures[future]}: {error}")
+        self.stdout.write(self.style.SUCCESS(f"{len(names) - failures} image(s) processed, {failures} failure(s)."))
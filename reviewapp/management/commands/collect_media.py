@@ -0,0 +1,50 @@
+import os
+import time
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from reviewapp import images, models
+
+
+def get_reference_counts():
+    tickets = models.Ticket.objects.exclude(image="").exclude(image__isnull=True)
+    return dict(tickets.values_list("image").annotate(references=Count("id")).order_by().iterator())
+
+
+def list_files(storage):
+    # every stored file but the derivatives, which go away with their original
+    for root, directories, files in os.walk(storage.location):
+        if root == str(storage.location):
+            directories[:] = [directory for directory in directories if directory != settings.THUMBNAIL_DIR]
+        for file in files:
+            path = os.path.join(root, file)
+            yield PurePosixPath(os.path.relpath(path, storage.location)).as_posix(), os.path.getmtime(path)
+
+
+class Command(BaseCommand):
+    help = "Deletes the media files no ticket references anymore, along with their derivatives."
+
+    def add_arguments(self, parser):
+        # a file younger than that may belong to a ticket being saved, it is left to the next run
+        parser.add_argument("--min-age", type=int, default=3600, help="Minimum age in seconds of a deleted file.")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        references = get_reference_counts()
+        deadline = time.time() - options["min_age"]
+        orphans = [
+            name for name, modified in list_files(default_storage)
+            if name not in references and modified < deadline]
+        for name in orphans:
+            self.stdout.write(name)
+            if not options["dry_run"]:
+                default_storage.delete(name)
+                images.delete_derivatives(name)
+        shared = sum(1 for count in references.values() if count > 1)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(orphans)} unreferenced file(s) {'found' if options['dry_run'] else 'deleted'}, "
+            f"{len(references)} referenced file(s) of which {shared} shared between tickets."))
@@ -0,0 +1,66 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from authentication.models import User
+from reviewapp import models
+
+# "SCAN table" without any index, "SCAN table USING INDEX ..." only walks an index
+FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(\S+)(?: AS \S+)?$")
+
+
+class Command(BaseCommand):
+    help = "Runs EXPLAIN QUERY PLAN on the queries of every view and fails when one of them scans a whole table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", help="User whose pages are audited, the first user by default.")
+
+    def get_urls(self, user):
+        urls = [reverse(name) for name in ("home", "posts", "add-follower", "ticket-create", "review-ticket-create")]
+        ticket = models.Ticket.objects.filter(user=user).first()
+        if ticket:
+            urls += [reverse(name, args=[ticket.id]) for name in ("update-ticket", "delete-ticket", "review-create")]
+        review = models.Review.objects.filter(user=user).first()
+        if review:
+            urls += [reverse(name, args=[review.id]) for name in ("update-review", "delete-review")]
+        follow = models.UserFollows.objects.filter(user=user).first()
+        if follow:
+            urls.append(reverse("delete-follower", args=[follow.followed_user_id]))
+        return urls
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Query plans can only be audited on SQLite.")
+        users = User.objects.order_by("id")
+        if options["username"]:
+            users = users.filter(username=options["username"])
+        user = users.first()
+        if user is None:
+            raise CommandError("No user to audit the views with.")
+
+        client = Client()
+        client.force_login(user)
+        full_scans = []
+        with override_settings(ALLOWED_HOSTS=["*"]):
+            for url in self.get_urls(user):
+                with CaptureQueriesContext(connection) as context:
+                    client.get(url)
+                selects = [query["sql"] for query in context.captured_queries if query["sql"].startswith("SELECT")]
+                self.stdout.write(f"{url}: {len(context.captured_queries)} queries")
+                for sql in selects:
+                    for detail in self.explain(sql):
+                        if FULL_SCAN.match(detail):
+                            full_scans.append(url)
+                            self.stdout.write(self.style.ERROR(f"  {detail}\n    {sql}"))
+        if full_scans:
+            raise CommandError(f"Full table scans found on {len(set(full_scans))} view(s).")
+        self.stdout.write(self.style.SUCCESS("No full table scan found."))
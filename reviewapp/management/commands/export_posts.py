@@ -0,0 +1,23 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from reviewapp import transfer
+
+
+class Command(BaseCommand):
+    help = "Exports every ticket and review as JSON lines or CSV, streamed from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", nargs="?", default="-", help="File written, the standard output by default.")
+        parser.add_argument("--format", choices=["jsonl", "csv"], help="From the file extension by default.")
+
+    def handle(self, *args, **options):
+        file_format = transfer.get_format(options["output"], options["format"])
+        if options["output"] == "-":
+            count = transfer.write_records(transfer.export_records(), sys.stdout, file_format)
+            self.stderr.write(f"{count} posts exported.")
+            return
+        with open(options["output"], "w", newline="", encoding="utf-8") as file:
+            count = transfer.write_records(transfer.export_records(), file, file_format)
+        self.stdout.write(self.style.SUCCESS(f"{count} posts exported to {options['output']}."))
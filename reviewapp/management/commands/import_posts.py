@@ -0,0 +1,38 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from reviewapp import transfer
+
+
+class Command(BaseCommand):
+    help = "Imports tickets and reviews from JSON lines or CSV, as written by export_posts, by batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="File read, - for the standard input.")
+        parser.add_argument("--format", choices=["jsonl", "csv"], help="From the file extension by default.")
+        parser.add_argument("--images", help="Directory of the images, they are looked up in the storage otherwise.")
+        parser.add_argument("--batch-size", type=int, default=transfer.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        file_format = transfer.get_format(options["input"], options["format"])
+        importer = transfer.Importer(options["images"], options["batch_size"])
+        self.start = time.monotonic()
+        if options["input"] == "-":
+            imported, errors = importer.run(transfer.read_records(sys.stdin, file_format), self.progress)
+        else:
+            with open(options["input"], newline="", encoding="utf-8") as file:
+                imported, errors = importer.run(transfer.read_records(file, file_format), self.progress)
+
+        for line_number, error in errors:
+            self.stderr.write(f"line {line_number}: {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{imported['ticket']} tickets and {imported['review']} reviews imported, {len(errors)} errors."))
+        if imported["ticket"] and options["images"]:
+            self.stdout.write("Run build_thumbnails to generate the thumbnails of the imported images.")
+
+    def progress(self, imported, errors):
+        posts = imported["ticket"] + imported["review"]
+        rate = posts / max(time.monotonic() - self.start, 1e-6)
+        self.stdout.write(f"{posts} posts imported, {len(errors)} errors ({rate:.0f} posts/s)")
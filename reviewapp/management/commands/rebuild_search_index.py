@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from reviewapp import search
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index of tickets and reviews from their tables, then merges it."
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            for _, search_table, _ in search.SEARCH_TABLES.values():
+                cursor.execute(f"INSERT INTO {search_table} ({search_table}) VALUES ('rebuild')")
+                cursor.execute(f"INSERT INTO {search_table} ({search_table}) VALUES ('optimize')")
+                cursor.execute(f"SELECT count(*) FROM {search_table}")
+                self.stdout.write(f"{search_table}: {cursor.fetchone()[0]} rows indexed.")
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
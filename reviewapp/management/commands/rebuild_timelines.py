@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reviewapp import timeline
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the materialized home timelines of every user from tickets, reviews and follows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=timeline.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = timeline.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{count} timeline entries rebuilt."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reviewapp import ratings
+
+
+class Command(BaseCommand):
+    help = "Recomputes the review aggregates of the tickets and repairs the ones that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=ratings.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = ratings.reconcile(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{count} tickets repaired."))
@@ -0,0 +1,84 @@
+# Generated by Django 4.2 on 2026-10-18 08:44
+
+from collections import defaultdict
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_timelines(apps, schema_editor):
+    # every user sees their posts, those of the users they follow and the reviews of their tickets
+    Ticket = apps.get_model('reviewapp', 'Ticket')
+    Review = apps.get_model('reviewapp', 'Review')
+    UserFollows = apps.get_model('reviewapp', 'UserFollows')
+    FeedEntry = apps.get_model('reviewapp', 'FeedEntry')
+    followers = defaultdict(set)
+    for user_id, followed_user_id in UserFollows.objects.values_list('user_id', 'followed_user_id').iterator():
+        followers[followed_user_id].add(user_id)
+    entries = []
+    for ticket_id, user_id, time_created in Ticket.objects.values_list('id', 'user_id', 'time_created').iterator():
+        entries.extend(
+            FeedEntry(owner_id=owner_id, ticket_id=ticket_id, time_created=time_created)
+            for owner_id in {user_id} | followers[user_id])
+    reviews = Review.objects.values_list('id', 'user_id', 'ticket__user_id', 'time_created')
+    for review_id, user_id, ticket_user_id, time_created in reviews.iterator():
+        entries.extend(
+            FeedEntry(owner_id=owner_id, review_id=review_id, time_created=time_created)
+            for owner_id in {user_id, ticket_user_id} | followers[user_id])
+    FeedEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reviewapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='review',
+            name='body',
+            field=models.CharField(blank=True, max_length=8192, verbose_name='Commentaire'),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='headline',
+            field=models.CharField(max_length=128, verbose_name='Titre'),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='rating',
+            field=models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(5)], verbose_name='Note'),
+        ),
+        migrations.AlterField(
+            model_name='ticket',
+            name='title',
+            field=models.CharField(max_length=128, verbose_name='Titre'),
+        ),
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time_created', models.DateTimeField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+                ('review', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='reviewapp.review')),
+                ('ticket', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='reviewapp.ticket')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['owner', '-time_created', '-id'], name='feedentry_owner_time_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('owner', 'ticket'), name='feedentry_unique_owner_ticket'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('owner', 'review'), name='feedentry_unique_owner_review'),
+        ),
+        migrations.RunPython(build_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviewapp', '0002_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', '-time_created'], name='review_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['user', '-time_created'], name='ticket_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userfollows',
+            index=models.Index(fields=['followed_user', 'user'], name='userfollows_followed_user_idx'),
+        ),
+    ]
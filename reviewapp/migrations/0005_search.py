@@ -0,0 +1,46 @@
+from django.db import migrations
+
+# external content FTS5 tables, they store the index only and read the text from the posts tables,
+# the triggers keep them current on every write, bulk ones included
+SEARCH_TABLES = [
+    ('reviewapp_ticket', 'reviewapp_ticket_search', ['title', 'description']),
+    ('reviewapp_review', 'reviewapp_review_search', ['headline', 'body']),
+]
+
+
+def create_sql(table, search_table, columns):
+    names = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {search_table} USING fts5({names}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER {search_table}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {search_table} (rowid, {names}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER {search_table}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {search_table} ({search_table}, rowid, {names}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER {search_table}_update AFTER UPDATE OF {names} ON {table} BEGIN "
+        f"INSERT INTO {search_table} ({search_table}, rowid, {names}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {search_table} (rowid, {names}) VALUES (new.id, {new_values}); END",
+        f"INSERT INTO {search_table} ({search_table}) VALUES ('rebuild')",
+    ]
+
+
+def drop_sql(table, search_table, columns):
+    return [
+        f"DROP TRIGGER {search_table}_insert",
+        f"DROP TRIGGER {search_table}_delete",
+        f"DROP TRIGGER {search_table}_update",
+        f"DROP TABLE {search_table}",
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviewapp', '0004_time_updated'),
+    ]
+
+    operations = [
+        migrations.RunSQL(create_sql(*search_table), drop_sql(*search_table)) for search_table in SEARCH_TABLES
+    ]
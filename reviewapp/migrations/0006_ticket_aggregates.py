@@ -0,0 +1,101 @@
+# Generated by Django 4.2 on 2026-10-18 09:03
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+# SQLite drops the triggers of a table with it, which this migration and 0007_review_unique_ticket rebuild,
+# 0008_search_triggers creates the search triggers of 0005_search again and the first operation here does
+# when they are unapplied, so that unapplying 0005_search finds them
+SEARCH_TABLES = [
+    ('reviewapp_ticket', 'reviewapp_ticket_search', ['title', 'description']),
+    ('reviewapp_review', 'reviewapp_review_search', ['headline', 'body']),
+]
+
+
+def trigger_sql(table, search_table, columns):
+    names = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {search_table}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {search_table} (rowid, {names}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {search_table}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {search_table} ({search_table}, rowid, {names}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {search_table}_update AFTER UPDATE OF {names} ON {table} BEGIN "
+        f"INSERT INTO {search_table} ({search_table}, rowid, {names}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {search_table} (rowid, {names}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+AGGREGATE_FIELDS = [
+    'review_count', 'rating_sum', *(f'rating_count_{rating}' for rating in range(6)), 'last_review_time',
+]
+
+
+def compute_aggregates(apps, schema_editor):
+    # the aggregates of every reviewed ticket from a single grouped query, the others keep the defaults
+    Ticket = apps.get_model('reviewapp', 'Ticket')
+    Review = apps.get_model('reviewapp', 'Review')
+    counts = {f'rating_count_{rating}': models.Count('id', filter=models.Q(rating=rating)) for rating in range(6)}
+    aggregates = Review.objects.values('ticket_id').order_by().annotate(
+        review_count=models.Count('id'), rating_sum=Coalesce(models.Sum('rating'), 0), **counts,
+        last_review_time=models.Max('time_created'))
+    tickets = [Ticket(id=values.pop('ticket_id'), **values) for values in aggregates.iterator()]
+    Ticket.objects.bulk_update(tickets, AGGREGATE_FIELDS, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviewapp', '0005_search'),
+    ]
+
+    operations = [
+        *(migrations.RunSQL(migrations.RunSQL.noop, trigger_sql(*search_table)) for search_table in SEARCH_TABLES),
+        migrations.AddField(
+            model_name='ticket',
+            name='last_review_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='rating_count_0',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='rating_count_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='rating_count_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='rating_count_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='rating_count_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='rating_count_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(compute_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-18 09:16
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+AGGREGATE_FIELDS = [
+    'review_count', 'rating_sum', *(f'rating_count_{rating}' for rating in range(6)), 'last_review_time',
+]
+
+
+def remove_duplicate_reviews(apps, schema_editor):
+    # keeps the earliest review of every ticket, then computes the aggregates of their tickets again
+    Ticket = apps.get_model('reviewapp', 'Ticket')
+    Review = apps.get_model('reviewapp', 'Review')
+    ticket_ids = list(
+        Review.objects.values('ticket_id').annotate(count=models.Count('id')).filter(count__gt=1)
+        .values_list('ticket_id', flat=True))
+    if not ticket_ids:
+        return
+    earliest = Review.objects.filter(ticket_id=models.OuterRef('ticket_id')).order_by('time_created', 'id')
+    Review.objects.filter(ticket_id__in=ticket_ids).exclude(id=models.Subquery(earliest.values('id')[:1])).delete()
+    reviews = Review.objects.filter(ticket_id__in=ticket_ids)
+    counts = {f'rating_count_{rating}': models.Count('id', filter=models.Q(rating=rating)) for rating in range(6)}
+    aggregates = reviews.values('ticket_id').order_by().annotate(
+        review_count=models.Count('id'), rating_sum=Coalesce(models.Sum('rating'), 0), **counts,
+        last_review_time=models.Max('time_created'))
+    tickets = [Ticket(id=values.pop('ticket_id'), **values) for values in aggregates.iterator()]
+    Ticket.objects.bulk_update(tickets, AGGREGATE_FIELDS, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviewapp', '0006_ticket_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_reviews, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('ticket',), name='review_unique_ticket'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# SQLite drops the triggers of a table with it, which 0006_ticket_aggregates and 0007_review_unique_ticket do
+# when they rebuild the ticket and review tables, their rows keep their ids so the search tables stay valid
+SEARCH_TABLES = [
+    ('reviewapp_ticket', 'reviewapp_ticket_search', ['title', 'description']),
+    ('reviewapp_review', 'reviewapp_review_search', ['headline', 'body']),
+]
+
+
+def trigger_sql(table, search_table, columns):
+    names = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {search_table}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {search_table} (rowid, {names}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {search_table}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {search_table} ({search_table}, rowid, {names}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {search_table}_update AFTER UPDATE OF {names} ON {table} BEGIN "
+        f"INSERT INTO {search_table} ({search_table}, rowid, {names}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {search_table} (rowid, {names}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviewapp', '0007_review_unique_ticket'),
+    ]
+
+    operations = [
+        # the reverse migrations rebuild the tables again, 0005_search then drops triggers created here
+        migrations.RunSQL(trigger_sql(*search_table), migrations.RunSQL.noop) for search_table in SEARCH_TABLES
+    ]
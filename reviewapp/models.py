@@ -1,14 +1,61 @@
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import models, transaction
+
+from . import images
+
+RATINGS = range(6)
 
 
 class Ticket(models.Model):
+    AGGREGATE_FIELDS = [
+        'review_count', 'rating_sum', *[f'rating_count_{rating}' for rating in RATINGS], 'last_review_time']
+
     title = models.CharField(max_length=128, verbose_name="Titre")
     description = models.TextField(max_length=2048, blank=True)
     user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     image = models.ImageField(null=True, blank=True)
     time_created = models.DateTimeField(auto_now_add=True)
+    # versions the cached fragments of the ticket
+    time_updated = models.DateTimeField(auto_now=True)
+    # aggregates of the reviews of the ticket, maintained by reviewapp.ratings
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count_0 = models.PositiveIntegerField(default=0)
+    rating_count_1 = models.PositiveIntegerField(default=0)
+    rating_count_2 = models.PositiveIntegerField(default=0)
+    rating_count_3 = models.PositiveIntegerField(default=0)
+    rating_count_4 = models.PositiveIntegerField(default=0)
+    rating_count_5 = models.PositiveIntegerField(default=0)
+    last_review_time = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', '-time_created'], name='ticket_user_time_idx')]
+
+    def save(self, *args, **kwargs):
+        # the aggregates are only written by reviewapp.ratings, a ticket loaded before a review must not undo it
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.AGGREGATE_FIELDS]
+        super().save(*args, **kwargs)
+
+    @property
+    def has_review(self):
+        return self.review_count > 0
+
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.review_count if self.review_count else None
+
+    def rating_distribution(self):
+        return [getattr(self, f'rating_count_{rating}') for rating in RATINGS]
+
+    def thumbnail_srcset(self):
+        return images.srcset(self.image.name, 'jpeg')
+
+    def webp_srcset(self):
+        return images.srcset(self.image.name, 'webp')
 
 
 class Review(models.Model):
@@ -25,6 +72,18 @@ class Review(models.Model):
     user = models.ForeignKey(
         to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     time_created = models.DateTimeField(auto_now_add=True)
+    # versions the cached fragments of the review
+    time_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', '-time_created'], name='review_user_time_idx')]
+        # a ticket gets a single review, enforced by the database so that concurrent submissions cannot both pass
+        constraints = [models.UniqueConstraint(fields=['ticket'], name='review_unique_ticket')]
+
+    def save(self, *args, **kwargs):
+        # the aggregates of the ticket are updated by the signals of the save, in the same transaction
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
 
 
 class UserFollows(models.Model):
@@ -38,3 +97,20 @@ class UserFollows(models.Model):
         # ensures we don't get multiple UserFollows instances
         # for unique user-user_followed pairs
         unique_together = ('user', 'followed_user', )
+        # the unique pair above only serves lookups by user, subscribers are looked up by followed_user
+        indexes = [models.Index(fields=['followed_user', 'user'], name='userfollows_followed_user_idx')]
+
+
+class FeedEntry(models.Model):
+    owner = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="feed_entries")
+    ticket = models.ForeignKey(to=Ticket, on_delete=models.CASCADE, null=True, blank=True)
+    review = models.ForeignKey(to=Review, on_delete=models.CASCADE, null=True, blank=True)
+    time_created = models.DateTimeField()
+
+    class Meta:
+        # the home timeline of a user is a single range scan on this index
+        indexes = [models.Index(fields=['owner', '-time_created', '-id'], name='feedentry_owner_time_idx')]
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'ticket'], name='feedentry_unique_owner_ticket'),
+            models.UniqueConstraint(fields=['owner', 'review'], name='feedentry_unique_owner_review'),
+        ]
@@ -0,0 +1,75 @@
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from . import models
+
+BATCH_SIZE = 1000
+AGGREGATE_FIELDS = models.Ticket.AGGREGATE_FIELDS
+
+
+def update_ticket(ticket_id, rating, change, **values):
+    # a single UPDATE with F() expressions, concurrent reviews of the ticket cannot lose each other's change
+    rating = int(rating)
+    models.Ticket.objects.filter(id=ticket_id).update(
+        review_count=F('review_count') + change,
+        rating_sum=F('rating_sum') + rating * change,
+        **{f'rating_count_{rating}': F(f'rating_count_{rating}') + change},
+        **values)
+
+
+def last_review_time():
+    reviews = models.Review.objects.filter(ticket_id=OuterRef('id')).order_by('-time_created')
+    return Subquery(reviews.values('time_created')[:1])
+
+
+def review_added(review):
+    update_ticket(
+        review.ticket_id, review.rating, 1,
+        last_review_time=Coalesce(Greatest('last_review_time', review.time_created), review.time_created))
+
+
+def review_removed(ticket_id, rating):
+    update_ticket(ticket_id, rating, -1, last_review_time=last_review_time())
+
+
+def review_changed(review, previous_ticket_id, previous_rating):
+    if (previous_ticket_id, previous_rating) == (review.ticket_id, review.rating):
+        return
+    review_removed(previous_ticket_id, previous_rating)
+    review_added(review)
+
+
+def get_review_aggregates(reviews):
+    # aggregates of every reviewed ticket, computed from the reviews in a single grouped query
+    counts = {f'rating_count_{rating}': Count('id', filter=Q(rating=rating)) for rating in models.RATINGS}
+    reviews = reviews.values('ticket_id').order_by().annotate(
+        review_count=Count('id'), rating_sum=Coalesce(Sum('rating'), 0), **counts,
+        last_review_time=Max('time_created'))
+    return {aggregates.pop('ticket_id'): aggregates for aggregates in reviews.iterator()}
+
+
+def reconcile(batch_size=BATCH_SIZE, ticket_ids=None):
+    # repairs the tickets, all or the given ones, whose aggregates drifted from their reviews, returns their number
+    tickets = models.Ticket.objects.all()
+    reviews = models.Review.objects.all()
+    if ticket_ids is not None:
+        tickets = tickets.filter(id__in=ticket_ids)
+        reviews = reviews.filter(ticket_id__in=ticket_ids)
+    expected = get_review_aggregates(reviews)
+    empty = {field: 0 for field in AGGREGATE_FIELDS}
+    empty['last_review_time'] = None
+
+    repaired = 0
+    drifted = []
+    for ticket in tickets.only('id', *AGGREGATE_FIELDS).iterator(chunk_size=batch_size):
+        aggregates = expected.get(ticket.id, empty)
+        if any(getattr(ticket, field) != value for field, value in aggregates.items()):
+            for field, value in aggregates.items():
+                setattr(ticket, field, value)
+            drifted.append(ticket)
+        if len(drifted) >= batch_size:
+            models.Ticket.objects.bulk_update(drifted, AGGREGATE_FIELDS)
+            repaired += len(drifted)
+            drifted = []
+    models.Ticket.objects.bulk_update(drifted, AGGREGATE_FIELDS)
+    return repaired + len(drifted)
@@ -0,0 +1,126 @@
+import re
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from . import feed
+
+# matched terms are wrapped in control characters by SQLite, then marked once the text is escaped
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+
+# (posts table, FTS5 table, [title column, text column]) of the searched posts
+SEARCH_TABLES = {
+    feed.TICKET: ("reviewapp_ticket", "reviewapp_ticket_search", ["title", "description"]),
+    feed.REVIEW: ("reviewapp_review", "reviewapp_review_search", ["headline", "body"]),
+}
+# bm25 weights of the title and text columns
+TITLE_WEIGHT = 10.0
+TEXT_WEIGHT = 1.0
+
+
+def create_index_sql(table, search_table, columns):
+    # external content tables, they store the index only and read the text from the posts tables
+    return [
+        f"CREATE VIRTUAL TABLE {search_table} USING fts5({', '.join(columns)}, content='{table}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        *trigger_sql(table, search_table, columns),
+        f"INSERT INTO {search_table} ({search_table}) VALUES ('rebuild')",
+    ]
+
+
+def trigger_sql(table, search_table, columns):
+    # the triggers keep the index current on every write, bulk ones included
+    names = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    delete = f"INSERT INTO {search_table} ({search_table}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+    insert = f"INSERT INTO {search_table} (rowid, {names}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {search_table}_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {search_table}_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {search_table}_update AFTER UPDATE OF {names} ON {table} "
+        f"BEGIN {delete} {insert} END",
+    ]
+
+
+def drop_index_sql(table, search_table, columns):
+    return [
+        f"DROP TRIGGER IF EXISTS {search_table}_insert",
+        f"DROP TRIGGER IF EXISTS {search_table}_delete",
+        f"DROP TRIGGER IF EXISTS {search_table}_update",
+        f"DROP TABLE {search_table}",
+    ]
+
+
+def create_missing_triggers(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    # SQLite drops the triggers of a table with it, which migrations do when they rebuild the table to alter it,
+    # its rows keep their ids so only the triggers need to be created again after migrate
+    search_connection = connections[using]
+    tables = search_connection.introspection.table_names()
+    with search_connection.cursor() as cursor:
+        for table, search_table, columns in SEARCH_TABLES.values():
+            if search_table in tables:
+                for sql in trigger_sql(table, search_table, columns):
+                    cursor.execute(sql)
+
+
+class SearchPage:
+    def __init__(self, posts, number, has_next):
+        self.posts = posts
+        self.number = number
+        self.has_next = has_next
+
+
+def match_query(text):
+    # every word is looked up as a quoted prefix, operators typed by the user are never interpreted
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def highlight(text):
+    return mark_safe(escape(text).replace(MATCH_START, "<mark>").replace(MATCH_END, "</mark>"))
+
+
+def search_sql(search_table):
+    return (
+        f"SELECT %s, rowid, bm25({search_table}, {TITLE_WEIGHT}, {TEXT_WEIGHT}) AS rank, "
+        f"highlight({search_table}, 0, '{MATCH_START}', '{MATCH_END}'), "
+        f"snippet({search_table}, 1, '{MATCH_START}', '{MATCH_END}', '…', {settings.SEARCH_SNIPPET_WORDS}) "
+        f"FROM {search_table} WHERE {search_table} MATCH %s")
+
+
+def get_matches(query, page_size, offset):
+    # (content type, id, rank, title, snippet) of the matching posts of the page, best first
+    sql = " UNION ALL ".join(search_sql(search_table) for _, search_table, _ in SEARCH_TABLES.values())
+    params = [param for content_type in SEARCH_TABLES for param in (content_type, query)]
+    with connection.cursor() as cursor:
+        cursor.execute(f"{sql} ORDER BY rank LIMIT %s OFFSET %s", [*params, page_size, offset])
+        return cursor.fetchall()
+
+
+def search_posts(text, page_number=1, page_size=None):
+    # ranked by relevance, the pages are numbered and bounded by SEARCH_MAX_PAGES as deep offsets get slower
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    page_number = min(max(page_number, 1), settings.SEARCH_MAX_PAGES)
+    query = match_query(text)
+    if not query:
+        return SearchPage([], page_number, False)
+    matches = get_matches(query, page_size + 1, (page_number - 1) * page_size)
+    keys = [(rank, content_type, post_id) for content_type, post_id, rank, *_ in matches[:page_size]]
+    tickets = feed.get_feed_tickets().in_bulk(feed.get_post_ids(keys, feed.TICKET))
+    reviews = feed.get_feed_reviews().in_bulk(feed.get_post_ids(keys, feed.REVIEW))
+    instances = {feed.TICKET: tickets, feed.REVIEW: reviews}
+    posts = []
+    for content_type, post_id, _, title, snippet in matches[:page_size]:
+        post = instances[content_type].get(post_id)
+        if post is None:
+            # deleted since the match
+            continue
+        post.content_type = content_type
+        post.highlighted_title = highlight(title)
+        post.highlighted_snippet = highlight(snippet)
+        posts.append(post)
+    return SearchPage(posts, page_number, len(matches) > page_size and page_number < settings.SEARCH_MAX_PAGES)
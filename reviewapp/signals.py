@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache, events, feed, follows, images, models, ratings, timeline
+
+
+@receiver(pre_save, sender=models.Ticket)
+def ticket_saving(sender, instance, **kwargs):
+    # the uploaded file is only written to the storage after this signal
+    instance.image_uploaded = bool(instance.image) and not instance.image._committed
+
+
+@receiver(post_save, sender=models.Ticket)
+def ticket_saved(sender, instance, created, **kwargs):
+    if getattr(instance, "image_uploaded", False):
+        name = instance.image.name
+        transaction.on_commit(lambda: images.queue_derivatives(name))
+    author_ids = {instance.user_id}
+    if created:
+        owner_ids = timeline.fan_out_ticket(instance)
+        event = events.post_event(instance, feed.TICKET)
+        transaction.on_commit(lambda: events.broker.publish(owner_ids, event))
+    else:
+        # reviews show the ticket they answer
+        author_ids.update(instance.review_set.values_list('user_id', flat=True))
+    cache.invalidate_feeds(timeline.get_audience_ids(author_ids))
+
+
+@receiver(post_delete, sender=models.Ticket)
+def ticket_deleted(sender, instance, **kwargs):
+    cache.invalidate_feeds(timeline.get_audience_ids({instance.user_id}))
+
+
+@receiver(images.derivatives_generated)
+def derivatives_generated(sender, name, **kwargs):
+    # the snippets of the tickets showing the image, and of their reviews, are cached by the time_updated of the
+    # ticket, they only list the derivatives generated when they were rendered
+    tickets = models.Ticket.objects.filter(image=name)
+    author_ids = set(tickets.values_list('user_id', flat=True))
+    author_ids.update(models.Review.objects.filter(ticket__image=name).values_list('user_id', flat=True))
+    tickets.update(time_updated=timezone.now())
+    cache.invalidate_feeds(timeline.get_audience_ids(author_ids))
+
+
+@receiver(pre_save, sender=models.Review)
+def review_saving(sender, instance, **kwargs):
+    # the aggregates of the ticket move from the rating the review had
+    instance.previous_rating = None
+    if instance.pk is not None:
+        instance.previous_rating = models.Review.objects.filter(pk=instance.pk).values_list(
+            'ticket_id', 'rating').first()
+
+
+@receiver(post_save, sender=models.Review)
+def review_saved(sender, instance, created, **kwargs):
+    if instance.previous_rating is None:
+        ratings.review_added(instance)
+    else:
+        ratings.review_changed(instance, *instance.previous_rating)
+    if created:
+        owner_ids = timeline.fan_out_review(instance)
+        event = events.post_event(instance, feed.REVIEW)
+        transaction.on_commit(lambda: events.broker.publish(owner_ids, event))
+    cache.invalidate_feeds(timeline.get_audience_ids({instance.user_id, instance.ticket.user_id}))
+
+
+@receiver(post_delete, sender=models.Review)
+def review_deleted(sender, instance, **kwargs):
+    ratings.review_removed(instance.ticket_id, instance.rating)
+    cache.invalidate_feeds(timeline.get_audience_ids({instance.user_id, instance.ticket.user_id}))
+
+
+@receiver(post_save, sender=models.UserFollows)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        timeline.add_follows(instance.user_id, [instance.followed_user_id])
+    cache.invalidate_feeds([instance.user_id])
+    follows.invalidate([instance.user_id, instance.followed_user_id])
+
+
+@receiver(post_delete, sender=models.UserFollows)
+def follow_deleted(sender, instance, **kwargs):
+    timeline.remove_follows(instance.user_id, [instance.followed_user_id])
+    cache.invalidate_feeds([instance.user_id])
+    follows.invalidate([instance.user_id, instance.followed_user_id])
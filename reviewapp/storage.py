@@ -0,0 +1,22 @@
+import hashlib
+import os
+from pathlib import PurePosixPath
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    # files are named after the SHA-256 of their content so identical uploads share one file,
+    # tickets hold the references and the collect_media command removes unreferenced files
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        name = f"{digest[:2]}/{digest}{PurePosixPath(name).suffix.lower()}"
+        if self.exists(name):
+            # the file is young again for collect_media, which could otherwise delete it before its ticket is saved
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
@@ -0,0 +1,805 @@
+import asyncio
+import base64
+import io
+import os
+import re
+import struct
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from PIL import Image, ImageFile
+
+from authentication.models import User
+from litreview import urls
+from . import async_views, events, feed, follows, images, models, ratings, search, timeline, transfer, uploads
+
+
+def image_file(width, height, name="cover.jpg", image_format="JPEG"):
+    content = io.BytesIO()
+    Image.new("RGB", (width, height), "navy").save(content, image_format)
+    return SimpleUploadedFile(name, content.getvalue(), content_type=f"image/{image_format.lower()}")
+
+
+def render_page(client, name):
+    # whitespace collapsed, the test client only records the Django templates
+    cache.clear()
+    response = client.get(reverse(name))
+    html = re.sub(r">\s+<", "><", re.sub(r"\s+", " ", response.content.decode())).strip()
+    return html, [template.name for template in response.templates]
+
+
+def computed_home_feed(user, page_size):
+    # the timeline computed straight from the posts tables, without the materialized entries
+    followed_users = models.UserFollows.objects.filter(user=user).values('followed_user')
+    ticket_filter = Q(user=user) | Q(user__in=followed_users)
+    review_filter = Q(user=user) | Q(user__in=followed_users) | Q(ticket__user=user)
+    return feed.build_feed(ticket_filter, review_filter, page_size=page_size)
+
+
+class MediaRootMixin:
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        overrides = override_settings(MEDIA_ROOT=media_root.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+
+class FeedQueryCountTests(TestCase):
+    # the session and the user come from their caches, then the timeline entries of the page
+    HOME_QUERIES = 1
+    # the union of post keys, the tickets and the reviews of the page
+    POSTS_QUERIES = 3
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        self.followed_user = User.objects.create_user(username="writer", password="1234Aze!")
+        models.UserFollows.objects.create(user=self.user, followed_user=self.followed_user)
+        self.client.force_login(self.user)
+        cache.clear()
+        # caches the user
+        self.client.get(reverse("home"))
+
+    def create_posts(self, count):
+        for index in range(count):
+            own_ticket = models.Ticket.objects.create(title=f"Ticket {index}", user=self.user)
+            models.Review.objects.create(
+                ticket=own_ticket, rating=3, headline=f"Critique {index}", user=self.followed_user)
+            followed_ticket = models.Ticket.objects.create(title=f"Livre {index}", user=self.followed_user)
+            models.Review.objects.create(ticket=followed_ticket, rating=4, headline=f"Avis {index}", user=self.user)
+
+    def test_home_query_count_does_not_depend_on_feed_size(self):
+        for count in (1, 10):
+            self.create_posts(count)
+            with self.assertNumQueries(self.HOME_QUERIES):
+                response = self.client.get(reverse("home"))
+            self.assertEqual(response.status_code, 200)
+
+    def test_posts_query_count_does_not_depend_on_feed_size(self):
+        for count in (1, 10):
+            self.create_posts(count)
+            with self.assertNumQueries(self.POSTS_QUERIES):
+                response = self.client.get(reverse("posts"))
+            self.assertEqual(response.status_code, 200)
+
+    def test_next_pages_cost_the_same_as_the_first(self):
+        self.create_posts(15)
+        response = self.client.get(reverse("home"))
+        self.assertIsNotNone(response.context["next_cursor"])
+        with self.assertNumQueries(self.HOME_QUERIES):
+            response = self.client.get(reverse("home"), {"cursor": response.context["next_cursor"]})
+        self.assertEqual(response.status_code, 200)
+
+
+class FeedCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        self.followed_user = User.objects.create_user(username="writer", password="1234Aze!")
+        models.UserFollows.objects.create(user=self.user, followed_user=self.followed_user)
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def test_cached_home_page_runs_no_query(self):
+        models.Ticket.objects.create(title="Dune", user=self.followed_user)
+        self.client.get(reverse("home"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("home"))
+        self.assertContains(response, "Dune")
+
+    def test_new_and_updated_posts_invalidate_the_follower_pages(self):
+        ticket = models.Ticket.objects.create(title="Dune", user=self.followed_user)
+        self.client.get(reverse("home"))
+        models.Review.objects.create(ticket=ticket, rating=5, headline="Chef-d'œuvre", user=self.followed_user)
+        self.assertContains(self.client.get(reverse("home")), "Chef-d&#x27;œuvre")
+        ticket.title = "Dune, tome 1"
+        ticket.save()
+        self.assertContains(self.client.get(reverse("home")), "Dune, tome 1", count=2)
+
+    def test_unfollow_invalidates_the_follower_pages(self):
+        models.Ticket.objects.create(title="Dune", user=self.followed_user)
+        self.assertContains(self.client.get(reverse("home")), "Dune")
+        models.UserFollows.objects.get(user=self.user).delete()
+        self.assertNotContains(self.client.get(reverse("home")), "Dune")
+
+
+class FeedCursorTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        self.follower = User.objects.create_user(username="follower", password="1234Aze!")
+        models.UserFollows.objects.create(user=self.follower, followed_user=self.user)
+        self.time = datetime(2026, 1, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+
+    def create_posts_at(self, count):
+        # tickets and reviews created at the same instant
+        for index in range(count):
+            ticket = models.Ticket.objects.create(title=f"Ticket {index}", user=self.user)
+            models.Review.objects.create(ticket=ticket, rating=3, headline=f"Critique {index}", user=self.user)
+        models.Ticket.objects.update(time_created=self.time)
+        models.Review.objects.update(time_created=self.time)
+        models.FeedEntry.objects.update(time_created=self.time)
+
+    def paginate(self, get_page):
+        posts, cursor = [], None
+        while True:
+            page = get_page(cursor)
+            posts += [(post.content_type, post.id) for post in page.posts]
+            if page.next_cursor is None:
+                return posts
+            cursor = page.next_cursor
+
+    def test_cursors_round_trip(self):
+        cursor = feed.encode_cursor(self.time, feed.TICKET, 42)
+        self.assertEqual(feed.decode_cursor(cursor, 3), (self.time, feed.TICKET, 42))
+        self.assertEqual(feed.decode_cursor(feed.encode_cursor(self.time, 7), 2), (self.time, 7))
+        # safe in a query string
+        self.assertRegex(cursor, r"^[A-Za-z0-9_=-]+$")
+
+    def test_invalid_cursors_are_ignored(self):
+        for cursor in (
+                None, "", "not a cursor", "%%%", feed.encode_cursor(self.time, 42),
+                base64.urlsafe_b64encode(b"2026-13-01|TICKET|1").decode(),
+                base64.urlsafe_b64encode(b"2026-01-01|TICKET|un").decode(),
+                base64.urlsafe_b64encode(b"\xff\xfe").decode()):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(feed.decode_cursor(cursor, 3))
+
+        self.create_posts_at(2)
+        first_page = [(post.content_type, post.id) for post in feed.user_posts(self.user, page_size=2).posts]
+        pages = feed.user_posts(self.user, "not a cursor", page_size=2), feed.timeline_feed(self.user, "%%%", 2)
+        self.assertEqual([(post.content_type, post.id) for post in pages[0].posts], first_page)
+        self.assertEqual(len(pages[1].posts), 2)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("api-posts"), {"cursor": "not a cursor"})
+        self.assertEqual(len(response.json()["results"]), 4)
+
+    def test_posts_of_the_same_instant_are_paginated_once(self):
+        self.create_posts_at(3)
+        ticket_ids = sorted(models.Ticket.objects.values_list("id", flat=True), reverse=True)
+        review_ids = sorted(models.Review.objects.values_list("id", flat=True), reverse=True)
+        # tickets before reviews, newest id first
+        expected = [(feed.TICKET, post_id) for post_id in ticket_ids]
+        expected += [(feed.REVIEW, post_id) for post_id in review_ids]
+        for page_size in (1, 2, 4):
+            with self.subTest(page_size=page_size):
+                self.assertEqual(
+                    self.paginate(lambda cursor: feed.user_posts(self.user, cursor, page_size)), expected)
+                timeline = self.paginate(lambda cursor: feed.timeline_feed(self.follower, cursor, page_size))
+                self.assertEqual(sorted(timeline), sorted(expected))
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        self.followed_user = User.objects.create_user(username="writer", password="1234Aze!")
+        self.other_user = User.objects.create_user(username="stranger", password="1234Aze!")
+
+    def assert_timeline_matches_computed_feed(self):
+        timeline = feed.timeline_feed(self.user, page_size=100).posts
+        computed = computed_home_feed(self.user, 100).posts
+        self.assertEqual(
+            [(post.content_type, post.id) for post in timeline],
+            [(post.content_type, post.id) for post in computed])
+
+    def test_follow_and_unfollow_update_the_timeline(self):
+        own_ticket = models.Ticket.objects.create(title="Le mien", user=self.user)
+        models.Review.objects.create(ticket=own_ticket, rating=2, headline="Sur mon ticket", user=self.followed_user)
+        followed_ticket = models.Ticket.objects.create(title="Le sien", user=self.followed_user)
+        models.Review.objects.create(ticket=followed_ticket, rating=5, headline="Avis", user=self.other_user)
+        self.assert_timeline_matches_computed_feed()
+
+        follow = models.UserFollows.objects.create(user=self.user, followed_user=self.followed_user)
+        models.Ticket.objects.create(title="Nouveau", user=self.followed_user)
+        self.assert_timeline_matches_computed_feed()
+
+        follow.delete()
+        self.assert_timeline_matches_computed_feed()
+        self.assertEqual(len(feed.timeline_feed(self.user).posts), 2)
+
+    def test_deleted_posts_leave_the_timeline(self):
+        models.UserFollows.objects.create(user=self.user, followed_user=self.followed_user)
+        ticket = models.Ticket.objects.create(title="Éphémère", user=self.followed_user)
+        models.Review.objects.create(ticket=ticket, rating=1, headline="Court", user=self.followed_user)
+        ticket.delete()
+        self.assertEqual(feed.timeline_feed(self.user).posts, [])
+
+    def test_rebuild_restores_the_timeline(self):
+        models.UserFollows.objects.create(user=self.user, followed_user=self.followed_user)
+        ticket = models.Ticket.objects.create(title="Livre", user=self.followed_user)
+        models.Review.objects.create(ticket=ticket, rating=4, headline="Bien", user=self.user)
+        models.FeedEntry.objects.all().delete()
+        timeline.rebuild()
+        self.assert_timeline_matches_computed_feed()
+
+
+class APITests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        self.followed_user = User.objects.create_user(username="writer", password="1234Aze!")
+        models.UserFollows.objects.create(user=self.user, followed_user=self.followed_user)
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def test_feed_is_paginated_with_cursors(self):
+        for index in range(25):
+            models.Ticket.objects.create(title=f"Livre {index}", user=self.followed_user)
+        data = self.client.get(reverse("api-feed")).json()
+        self.assertEqual(len(data["results"]), 20)
+        self.assertEqual(data["results"][0]["title"], "Livre 24")
+        data = self.client.get(reverse("api-feed"), {"cursor": data["next"]}).json()
+        self.assertEqual(len(data["results"]), 5)
+        self.assertIsNone(data["next"])
+
+    def test_fields_selects_the_serialized_fields(self):
+        models.Ticket.objects.create(title="Dune", user=self.followed_user)
+        data = self.client.get(reverse("api-feed"), {"fields": "title"}).json()
+        self.assertEqual(data["results"], [{"type": "ticket", "title": "Dune"}])
+
+    def test_unchanged_feed_returns_304(self):
+        ticket = models.Ticket.objects.create(title="Dune", user=self.followed_user)
+        response = self.client.get(reverse("api-feed"))
+        self.assertTrue(response.has_header("Last-Modified"))
+        # the newest entry of the timeline
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("api-feed"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        etag = response["ETag"]
+        ticket.title = "Dune, tome 1"
+        ticket.save()
+        response = self.client.get(reverse("api-feed"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["title"], "Dune, tome 1")
+
+    def test_last_modified_moves_with_edits_and_deletions(self):
+        ticket = models.Ticket.objects.create(title="Dune", user=self.followed_user)
+        models.Ticket.objects.create(title="Fondation", user=self.followed_user)
+        last_modified = self.client.get(reverse("api-feed"))["Last-Modified"]
+        self.assertEqual(
+            self.client.get(reverse("api-feed"), HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        # HTTP dates have a one second resolution
+        with mock.patch("reviewapp.cache.time.time", return_value=time.time() + 2):
+            ticket.title = "Dune, tome 1"
+            ticket.save()
+            response = self.client.get(reverse("api-feed"), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        last_modified = response["Last-Modified"]
+
+        with mock.patch("reviewapp.cache.time.time", return_value=time.time() + 4):
+            ticket.delete()
+            response = self.client.get(reverse("api-feed"), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post["title"] for post in response.json()["results"]], ["Fondation"])
+
+    def test_validators_follow_the_changes_of_other_processes(self):
+        # changes without signals, as seen by a process whose cache was not invalidated
+        ticket = models.Ticket.objects.create(title="Dune", user=self.followed_user)
+        feed_etag = self.client.get(reverse("api-feed"))["ETag"]
+        follows_etag = self.client.get(reverse("api-follows"))["ETag"]
+        models.Ticket.objects.filter(id=ticket.id).update(title="Dune, tome 1")
+        models.UserFollows.objects.bulk_create([models.UserFollows(user=self.followed_user, followed_user=self.user)])
+        self.assertEqual(self.client.get(reverse("api-feed"), HTTP_IF_NONE_MATCH=feed_etag).status_code, 304)
+
+        expired = time.time() + settings.FEED_CACHE_TIMEOUT + 1
+        with mock.patch("django.core.cache.backends.locmem.time.time", return_value=expired):
+            response = self.client.get(reverse("api-feed"), HTTP_IF_NONE_MATCH=feed_etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["results"][0]["title"], "Dune, tome 1")
+            response = self.client.get(reverse("api-follows"), HTTP_IF_NONE_MATCH=follows_etag)
+            self.assertEqual(response.json()["followers"], ["writer"])
+
+    def test_follows_returns_304_until_the_graph_changes(self):
+        response = self.client.get(reverse("api-follows"))
+        self.assertEqual(response.json(), {"following": ["writer"], "followers": []})
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(reverse("api-follows"), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        models.UserFollows.objects.create(user=self.followed_user, followed_user=self.user)
+        self.assertEqual(self.client.get(reverse("api-follows"), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_anonymous_requests_are_forbidden(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("api-posts")).status_code, 403)
+
+    def test_new_posts_are_polled_from_the_since_cursor(self):
+        models.Ticket.objects.create(title="Dune", user=self.followed_user)
+        since = self.client.get(reverse("api-feed")).json()["since"]
+        self.assertEqual(self.client.get(reverse("api-feed-new"), {"since": since}).json()["results"], [])
+        for title in ("Fondation", "Hypérion"):
+            models.Ticket.objects.create(title=title, user=self.followed_user)
+        # the count of the new entries
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("api-feed-new"), {"since": since, "count": 1})
+        self.assertEqual(response.json(), {"count": 2})
+        with self.assertNumQueries(0):
+            self.client.get(reverse("api-feed-new"), {"since": since, "count": 1})
+        data = self.client.get(reverse("api-feed-new"), {"since": since, "fields": "title"}).json()
+        self.assertEqual([post["title"] for post in data["results"]], ["Hypérion", "Fondation"])
+        self.assertEqual(self.client.get(reverse("api-feed-new"), {"since": data["since"]}).json()["results"], [])
+        self.assertEqual(self.client.get(reverse("api-feed-new"), {"since": "invalide"}).status_code, 400)
+
+
+class EventBrokerTests(TestCase):
+    async def test_events_reach_the_subscribers_of_their_audience(self):
+        broker = events.Broker(queue_size=10)
+        subscription = broker.subscribe(1)
+        other_subscription = broker.subscribe(2)
+        broker.publish([1], {"type": "ticket", "id": 1})
+        self.assertEqual(await asyncio.wait_for(subscription.queue.get(), 1), {"type": "ticket", "id": 1})
+        self.assertTrue(other_subscription.queue.empty())
+        broker.unsubscribe(subscription)
+        broker.unsubscribe(other_subscription)
+        self.assertEqual(broker.subscriptions, {})
+
+    async def test_slow_subscribers_are_dropped(self):
+        broker = events.Broker(queue_size=2)
+        subscription = broker.subscribe(1)
+        for event_id in range(3):
+            broker.publish([1], {"type": "ticket", "id": event_id})
+        await asyncio.sleep(0)
+        self.assertTrue(subscription.dropped)
+        self.assertIsNone(await subscription.queue.get())
+
+
+class AsyncURLConf:
+    # the async views next to the routes their templates link to, whatever LITREVIEW_ASYNC_VIEWS is
+    urlpatterns = [
+        path('async/', async_views.Home.as_view(), name='async-home'),
+        path('async/posts/', async_views.Posts.as_view(), name='async-posts'),
+        *urls.urlpatterns,
+    ]
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        models.Ticket.objects.create(title="Dune", user=self.user)
+        self.client.force_login(self.user)
+        self.async_client.cookies = self.client.cookies
+
+    async def test_async_pages_are_served_through_the_middleware(self):
+        # the async client runs the ASGI handler with every middleware of MIDDLEWARE
+        for name in ("async-home", "async-posts"):
+            response = await asyncio.wait_for(self.async_client.get(reverse(name)), 10)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, "Dune")
+            self.assertIn("total;dur=", response["Server-Timing"])
+
+
+class FollowsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        self.writers = [User.objects.create_user(username=f"writer{index}", password="1234Aze!") for index in range(3)]
+        for writer in self.writers:
+            models.Ticket.objects.create(title=f"Livre de {writer}", user=writer)
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def test_cached_follow_graph_only_fetches_the_users(self):
+        follows.follow(self.user, ["writer0", "writer1"])
+        self.client.get(reverse("add-follower"))
+        # the followed users and followers
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("add-follower"))
+        self.assertEqual(response.context["subscriptions"], self.writers[:2])
+
+    def test_bulk_follow(self):
+        response = self.client.post(reverse("add-follower"), {"username": "writer0, writer1 inconnu reader"})
+        self.assertContains(response, "Vous ne pouvez pas vous abonner à vous-même.")
+        self.assertContains(response, "Merci de saisir un utilisateur correct.")
+        self.assertEqual(follows.get_following_ids(self.user.id), {self.writers[0].id, self.writers[1].id})
+        self.assertEqual(follows.get_follower_ids(self.writers[0].id), {self.user.id})
+        self.assertEqual(len(feed.timeline_feed(self.user).posts), 2)
+
+        response = self.client.post(reverse("add-follower"), {"username": "writer1 writer2"})
+        self.assertContains(response, "Vous suivez déjà writer1.")
+        self.assertEqual(len(feed.timeline_feed(self.user).posts), 3)
+
+    def test_bulk_unfollow_runs_a_single_delete(self):
+        follows.follow(self.user, ["writer0", "writer1", "writer2"])
+        user_ids = [self.writers[0].id, self.writers[1].id]
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(follows.unfollow(self.user, user_ids), 2)
+        statements = [query["sql"] for query in context.captured_queries]
+        self.assertEqual(len([sql for sql in statements if sql.startswith('DELETE FROM "reviewapp_userfollows"')]), 1)
+        self.assertEqual(len([sql for sql in statements if sql.startswith('DELETE FROM "reviewapp_feedentry"')]), 1)
+        self.assertEqual(follows.get_following_ids(self.user.id), {self.writers[2].id})
+        self.assertEqual(follows.get_follower_ids(self.writers[0].id), set())
+        self.assertEqual([post.title for post in feed.timeline_feed(self.user).posts], ["Livre de writer2"])
+
+
+class UserSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="Reader", password="1234Aze!")
+        for username in ("Margaux", "marguerite", "Martin", "Maxime", "Léa"):
+            User.objects.create_user(username=username, password="1234Aze!")
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def test_prefix_search_ignores_case(self):
+        self.assertEqual(follows.search_usernames("MARG"), ["Margaux", "marguerite"])
+        self.assertEqual(follows.search_usernames("lé"), ["Léa"])
+
+    def test_prefix_search_uses_the_username_index(self):
+        queryset = User.objects.filter(**follows.prefix_range("mar")).order_by("username_search")
+        self.assertIn("authentication_user_username_search", queryset.explain())
+
+    def test_fuzzy_matches_complete_the_prefix_matches(self):
+        self.assertEqual(follows.search_usernames("martn"), ["Martin"])
+
+    def test_renamed_users_are_found_under_their_new_username(self):
+        self.user.username = "Lecteur"
+        self.user.save(update_fields=["username"])
+        self.assertEqual(follows.search_usernames("lect"), ["Lecteur"])
+
+    def test_endpoint_leaves_out_the_user(self):
+        response = self.client.get(reverse("api-user-search"), {"q": "r"})
+        self.assertEqual(response.json(), {"results": []})
+        with self.assertNumQueries(0):
+            self.client.get(reverse("api-user-search"), {"q": "r"})
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        self.ticket = models.Ticket.objects.create(
+            title="Les Misérables", description="Un roman de Victor Hugo <b>classique</b>", user=self.user)
+        models.Review.objects.create(
+            ticket=self.ticket, rating=5, headline="Chef-d'œuvre", body="Hugo au sommet de son art", user=self.user)
+        models.Ticket.objects.create(title="Dune", description="Science-fiction", user=self.user)
+        self.client.force_login(self.user)
+
+    def test_search_is_ranked_and_ignores_accents(self):
+        page = search.search_posts("miserables")
+        self.assertEqual([post.id for post in page.posts], [self.ticket.id])
+        self.assertEqual(page.posts[0].highlighted_title, "Les <mark>Misérables</mark>")
+        # the title weighs more than the text
+        models.Ticket.objects.create(title="Hugo", user=self.user)
+        self.assertEqual(search.search_posts("hugo").posts[0].title, "Hugo")
+
+    def test_index_follows_updates_and_deletions(self):
+        self.ticket.title = "Notre-Dame de Paris"
+        self.ticket.save()
+        self.assertEqual(search.search_posts("misérables").posts, [])
+        self.assertEqual(len(search.search_posts("notre dame").posts), 1)
+        self.ticket.delete()
+        self.assertEqual(search.search_posts("hugo").posts, [])
+
+    def test_snippets_are_escaped_and_operators_ignored(self):
+        # an unbalanced quote would be an FTS5 syntax error
+        response = self.client.get(reverse("search"), {"q": '"classique'})
+        self.assertContains(response, "&lt;b&gt;<mark>classique</mark>&lt;/b&gt;")
+        self.assertNotContains(response, "Science-fiction")
+
+    def test_results_are_paginated(self):
+        page = search.search_posts("hugo", page_size=1)
+        self.assertTrue(page.has_next)
+        page = search.search_posts("hugo", 2, page_size=1)
+        self.assertEqual(len(page.posts), 1)
+        self.assertFalse(page.has_next)
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        self.ticket = models.Ticket.objects.create(title="Dune", user=self.user)
+
+    def assert_aggregates(self, review_count, rating_sum, distribution):
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.review_count, review_count)
+        self.assertEqual(self.ticket.rating_sum, rating_sum)
+        self.assertEqual(self.ticket.rating_distribution(), distribution)
+
+    def test_reviews_update_the_ticket_aggregates(self):
+        review = models.Review.objects.create(ticket=self.ticket, rating=4, headline="Bien", user=self.user)
+        self.assert_aggregates(1, 4, [0, 0, 0, 0, 1, 0])
+        self.assertEqual(self.ticket.last_review_time, review.time_created)
+        self.assertTrue(self.ticket.has_review)
+
+        review.rating = 2
+        review.save()
+        self.assert_aggregates(1, 2, [0, 0, 1, 0, 0, 0])
+        self.assertEqual(self.ticket.average_rating, 2)
+
+        review.delete()
+        self.assert_aggregates(0, 0, [0] * 6)
+        self.assertIsNone(self.ticket.last_review_time)
+        self.assertFalse(self.ticket.has_review)
+
+    def test_a_ticket_gets_a_single_review(self):
+        models.Review.objects.create(ticket=self.ticket, rating=4, headline="Bien", user=self.user)
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("review-create", args=[self.ticket.id]), {"rating": 2, "headline": "Encore", "body": ""})
+        self.assertContains(response, "Ce ticket a déjà une critique.")
+        self.assert_aggregates(1, 4, [0, 0, 0, 0, 1, 0])
+
+    def test_saving_a_stale_ticket_keeps_its_aggregates(self):
+        stale_ticket = models.Ticket.objects.get(id=self.ticket.id)
+        models.Review.objects.create(ticket=self.ticket, rating=3, headline="Moyen", user=self.user)
+        stale_ticket.title = "Dune, tome 1"
+        stale_ticket.save()
+        self.assert_aggregates(1, 3, [0, 0, 0, 1, 0, 0])
+
+    def test_reconcile_repairs_drifted_tickets(self):
+        models.Review.objects.create(ticket=self.ticket, rating=5, headline="Parfait", user=self.user)
+        other_ticket = models.Ticket.objects.create(title="Fondation", user=self.user)
+        models.Ticket.objects.filter(id=self.ticket.id).update(review_count=3, rating_count_5=0)
+        models.Ticket.objects.filter(id=other_ticket.id).update(rating_sum=7)
+        self.assertEqual(ratings.reconcile(), 2)
+        self.assert_aggregates(1, 5, [0, 0, 0, 0, 0, 1])
+        self.assertEqual(ratings.reconcile(), 0)
+
+
+class ImportExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        self.follower = User.objects.create_user(username="follower", password="1234Aze!")
+        models.UserFollows.objects.create(user=self.follower, followed_user=self.user)
+
+    def test_exported_posts_are_imported_with_their_dates(self):
+        ticket = models.Ticket.objects.create(title="Dune", description="Sable", user=self.user)
+        models.Review.objects.create(ticket=ticket, rating=4, headline="Bien", body="Épique", user=self.user)
+        for file_format in ["jsonl", "csv"]:
+            with self.subTest(file_format=file_format):
+                file = io.StringIO(newline="")
+                self.assertEqual(transfer.write_records(transfer.export_records(), file, file_format), 2)
+                # the copy replaces the exported posts
+                models.Ticket.objects.all().delete()
+                file.seek(0)
+                imported, errors = transfer.Importer(batch_size=1).run(transfer.read_records(file, file_format))
+                self.assertEqual(imported, {"ticket": 1, "review": 1})
+                self.assertEqual(errors, [])
+                copy = models.Ticket.objects.get()
+                self.assertEqual((copy.title, copy.time_created), ("Dune", ticket.time_created))
+                self.assertEqual(copy.review_count, 1)
+                self.assertEqual(copy.review_set.get().body, "Épique")
+                self.assertTrue(models.FeedEntry.objects.filter(owner=self.follower, ticket=copy).exists())
+
+    def test_invalid_records_are_reported_with_their_line(self):
+        lines = [
+            '{"type": "ticket", "id": 7, "user": "reader", "time_created": "2024-01-01T10:00:00+00:00", "title": "A"}',
+            "{invalid",
+            '{"type": "ticket", "id": 8, "user": "nobody", "title": "B"}',
+            '{"type": "review", "id": 1, "user": "reader", "ticket": 9, "rating": 3, "headline": "C"}',
+            '{"type": "review", "id": 2, "user": "reader", "ticket": 7, "rating": 9, "headline": "D"}',
+            '{"type": "review", "id": 3, "user": "reader", "ticket": 7, "rating": 3, "headline": "E"}',
+            '{"type": "review", "id": 4, "user": "reader", "ticket": 7, "rating": 1, "headline": "F"}',
+        ]
+        file = io.StringIO("\n".join(lines))
+        imported, errors = transfer.Importer(batch_size=2).run(transfer.read_records(file, "jsonl"))
+        self.assertEqual(imported, {"ticket": 1, "review": 1})
+        self.assertEqual([line_number for line_number, _ in errors], [2, 3, 4, 5, 7])
+        self.assertEqual(models.Ticket.objects.get().rating_sum, 3)
+
+
+class JinjaFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        self.followed_user = User.objects.create_user(username="writer", password="1234Aze!")
+        models.UserFollows.objects.create(user=self.user, followed_user=self.followed_user)
+        ticket = models.Ticket.objects.create(title="Dune <b>", description="Sable", user=self.followed_user)
+        models.Review.objects.create(ticket=ticket, rating=3, headline="Bien & beau", body="Épique", user=self.user)
+        models.Ticket.objects.create(title="Fondation", user=self.user)
+        self.client.force_login(self.user)
+
+    def render(self, name):
+        return render_page(self.client, name)
+
+    def test_jinja_pages_match_the_django_ones(self):
+        for name, posts_name in (("home", "home_posts"), ("posts", "user_posts")):
+            with self.subTest(name=name):
+                with override_settings(JINJA2_FEED=False):
+                    django_html, django_templates = self.render(name)
+                self.assertIn(f"reviewapp/{posts_name}.html", django_templates)
+                self.assertIn("Dune &lt;b&gt;", django_html)
+                with override_settings(JINJA2_FEED=True):
+                    jinja_html, jinja_templates = self.render(name)
+                self.assertEqual(jinja_html, django_html)
+                self.assertIn(f"reviewapp/{name}.html", jinja_templates)
+                self.assertNotIn(f"reviewapp/{posts_name}.html", jinja_templates)
+
+
+class ImageDerivativesTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        self.ticket = models.Ticket.objects.create(title="Dune", image=image_file(400, 200), user=self.user)
+        self.client.force_login(self.user)
+
+    def test_derivatives_are_generated_for_every_width_and_format(self):
+        name = self.ticket.image.name
+        self.assertFalse(images.has_derivatives(name))
+        images.generate_derivatives(name)
+        self.assertTrue(images.has_derivatives(name))
+        for width in (160, 320):
+            with Image.open(images.derivatives_storage.path(images.derivative_name(name, width, "webp"))) as image:
+                self.assertEqual((image.format, image.size), ("WEBP", (width, width // 2)))
+
+    def test_srcset_only_lists_generated_derivatives(self):
+        name = self.ticket.image.name
+        self.assertEqual(self.ticket.thumbnail_srcset(), "")
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, f'<img src="/media/{name}" loading="lazy" />', html=True)
+        self.assertNotContains(response, "image/webp")
+
+        # the cached snippet and page are replaced once the derivatives are generated
+        images.build_derivatives(name)
+        stem = name.rsplit(".", 1)[0]
+        self.assertEqual(
+            self.ticket.thumbnail_srcset(),
+            f"/media/thumbnails/{stem}_w160.jpeg 160w, /media/thumbnails/{stem}_w320.jpeg 320w")
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, f'srcset="{self.ticket.webp_srcset()}"')
+        self.assertContains(response, f'srcset="{self.ticket.thumbnail_srcset()}"')
+
+    def test_jinja_picture_matches_the_django_one(self):
+        images.generate_derivatives(self.ticket.image.name)
+        for name in ("home", "posts"):
+            with self.subTest(name=name):
+                with override_settings(JINJA2_FEED=False):
+                    django_html, _ = render_page(self.client, name)
+                with override_settings(JINJA2_FEED=True):
+                    jinja_html, _ = render_page(self.client, name)
+                self.assertIn(self.ticket.webp_srcset(), jinja_html)
+                self.assertEqual(jinja_html, django_html)
+
+    def test_failed_generations_are_logged(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        with mock.patch.object(images, "executor", executor), self.assertLogs("reviewapp.images", "ERROR") as logs:
+            images.queue_derivatives("missing.jpg")
+            # waits for the worker, which runs the callbacks
+            executor.shutdown(wait=True)
+        self.assertIn("Derivatives of missing.jpg could not be generated", logs.output[0])
+
+
+class CollectMediaTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+
+    def create_ticket(self, width):
+        return models.Ticket.objects.create(title="Dune", image=image_file(width, width), user=self.user)
+
+    def age(self, name, seconds):
+        modified = time.time() - seconds
+        os.utime(default_storage.path(name), (modified, modified))
+
+    def collect(self, *args):
+        output = io.StringIO()
+        call_command("collect_media", *args, stdout=output)
+        return output.getvalue()
+
+    def test_identical_uploads_share_one_file(self):
+        first, second = self.create_ticket(100), self.create_ticket(100)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(self.create_ticket(120).image.name, first.image.name)
+        self.assertIn("2 referenced file(s) of which 1 shared", self.collect())
+
+    def test_unreferenced_files_are_deleted_with_their_derivatives(self):
+        kept, deleted = self.create_ticket(100), self.create_ticket(120)
+        images.generate_derivatives(deleted.image.name)
+        name = deleted.image.name
+        deleted.delete()
+        self.age(name, 7200)
+        self.assertIn(name, self.collect())
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(any(
+            images.derivatives_storage.exists(derivative) for derivative in images.derivative_names(name)))
+        self.assertTrue(default_storage.exists(kept.image.name))
+
+    def test_young_files_are_kept(self):
+        ticket = self.create_ticket(100)
+        name = ticket.image.name
+        ticket.delete()
+        self.age(name, 60)
+        self.assertIn("0 unreferenced file(s) deleted", self.collect())
+        self.assertIn("1 unreferenced file(s) deleted", self.collect("--min-age", "30"))
+
+    def test_reuploads_make_the_file_young_again(self):
+        ticket = self.create_ticket(100)
+        name = ticket.image.name
+        ticket.delete()
+        self.age(name, 7200)
+        # the same image uploaded for a ticket which is not saved yet
+        self.assertEqual(default_storage.save("cover.jpg", image_file(100, 100)), name)
+        self.assertIn("0 unreferenced file(s) deleted", self.collect())
+        self.assertTrue(default_storage.exists(name))
+
+    def test_dry_run_deletes_nothing(self):
+        ticket = self.create_ticket(100)
+        name = ticket.image.name
+        ticket.delete()
+        self.age(name, 7200)
+        self.assertIn("1 unreferenced file(s) found", self.collect("--dry-run"))
+        self.assertTrue(default_storage.exists(name))
+
+
+@override_settings(IMAGE_UPLOAD_MAX_SIZE=20_000, IMAGE_MAX_PIXELS=1_000_000, IMAGE_MAX_DIMENSION=100)
+class ImageUploadTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="reader", password="1234Aze!")
+        self.client.force_login(self.user)
+
+    def upload(self, file):
+        response = self.client.post(reverse("ticket-create"), {"title": "Dune", "image": file})
+        if response.status_code == 302:
+            return None
+        return [error.code for error in response.context["form"].errors.as_data()["image"]]
+
+    def test_oversize_uploads_are_rejected(self):
+        noise = Image.frombytes("RGB", (100, 100), os.urandom(100 * 100 * 3))
+        content = io.BytesIO()
+        noise.save(content, "PNG")
+        self.assertGreater(len(content.getvalue()), 20_000)
+        self.assertEqual(self.upload(SimpleUploadedFile("noise.png", content.getvalue())), ["file_too_large"])
+        self.assertFalse(models.Ticket.objects.exists())
+
+    def test_oversize_uploads_are_not_buffered(self):
+        handler = uploads.SizeLimitedUploadHandler()
+        handler.new_file("image", "noise.png", "image/png", 30_000)
+        self.assertEqual(handler.receive_data_chunk(b"x" * 15_000, 0), b"x" * 15_000)
+        self.assertIsNone(handler.receive_data_chunk(b"x" * 15_000, 15_000))
+        file = handler.file_complete(30_000)
+        self.assertEqual((file.name, file.size, file.read()), ("noise.png", 30_000, b""))
+
+    def test_pixel_bombs_are_rejected_from_their_header(self):
+        # a 1x1 PNG whose header announces 8000x8000 pixels
+        content = io.BytesIO()
+        Image.new("RGB", (1, 1)).save(content, "PNG")
+        bomb = bytearray(content.getvalue())
+        bomb[16:24] = struct.pack(">II", 8000, 8000)
+        bomb[29:33] = struct.pack(">I", zlib.crc32(bytes(bomb[12:29])))
+        with mock.patch.object(ImageFile.ImageFile, "load", side_effect=AssertionError("decoded")):
+            self.assertEqual(self.upload(SimpleUploadedFile("bomb.png", bytes(bomb))), ["too_many_pixels"])
+
+    def test_large_images_are_downscaled(self):
+        self.assertIsNone(self.upload(image_file(300, 150)))
+        ticket = models.Ticket.objects.get()
+        with Image.open(ticket.image.path) as image:
+            self.assertEqual((image.format, image.size), ("JPEG", (100, 50)))
+
+    def test_small_images_are_kept(self):
+        file = image_file(80, 40)
+        self.assertIsNone(self.upload(file))
+        self.assertEqual(models.Ticket.objects.get().image.size, file.size)
+
+    def test_invalid_images_are_rejected(self):
+        self.assertEqual(self.upload(SimpleUploadedFile("cover.jpg", b"not an image")), ["invalid_image"])
+        self.assertFalse(models.Ticket.objects.exists())
@@ -0,0 +1,102 @@
+from collections import defaultdict
+
+from django.db.models import Q
+
+from . import models
+
+BATCH_SIZE = 1000
+
+
+def get_follower_ids(user_id):
+    return set(models.UserFollows.objects.filter(followed_user_id=user_id).values_list('user_id', flat=True))
+
+
+def get_audience_ids(author_ids):
+    # users whose timeline shows posts of the given authors
+    follower_ids = models.UserFollows.objects.filter(followed_user_id__in=author_ids).values_list('user_id', flat=True)
+    return set(author_ids) | set(follower_ids)
+
+
+def fan_out_ticket(ticket):
+    owner_ids = {ticket.user_id} | get_follower_ids(ticket.user_id)
+    entries = [
+        models.FeedEntry(owner_id=owner_id, ticket=ticket, time_created=ticket.time_created)
+        for owner_id in owner_ids]
+    models.FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    return owner_ids
+
+
+def fan_out_review(review):
+    # the author of the ticket also sees the reviews written on their tickets
+    owner_ids = {review.user_id, review.ticket.user_id} | get_follower_ids(review.user_id)
+    entries = [
+        models.FeedEntry(owner_id=owner_id, review=review, time_created=review.time_created)
+        for owner_id in owner_ids]
+    models.FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    return owner_ids
+
+
+def fan_out(tickets, reviews, batch_size=BATCH_SIZE):
+    # fan_out_ticket and fan_out_review of many posts, the followers of their authors are fetched at once,
+    # returns the users whose timeline changed
+    ticket_user_ids = dict(models.Ticket.objects.filter(
+        id__in={review.ticket_id for review in reviews}).values_list('id', 'user_id'))
+    author_ids = {post.user_id for post in [*tickets, *reviews]}
+    followers = defaultdict(set)
+    follows = models.UserFollows.objects.filter(followed_user_id__in=author_ids)
+    for user_id, followed_user_id in follows.values_list('user_id', 'followed_user_id'):
+        followers[followed_user_id].add(user_id)
+
+    entries = [
+        models.FeedEntry(owner_id=owner_id, ticket_id=ticket.id, time_created=ticket.time_created)
+        for ticket in tickets for owner_id in {ticket.user_id} | followers[ticket.user_id]]
+    entries.extend(
+        models.FeedEntry(owner_id=owner_id, review_id=review.id, time_created=review.time_created)
+        for review in reviews
+        for owner_id in {review.user_id, ticket_user_ids[review.ticket_id]} | followers[review.user_id])
+    models.FeedEntry.objects.bulk_create(entries, batch_size=batch_size, ignore_conflicts=True)
+    return {entry.owner_id for entry in entries}
+
+
+def add_follows(user_id, followed_user_ids):
+    tickets = models.Ticket.objects.filter(user_id__in=followed_user_ids).values_list('id', 'time_created')
+    reviews = models.Review.objects.filter(user_id__in=followed_user_ids).values_list('id', 'time_created')
+    entries = [
+        models.FeedEntry(owner_id=user_id, ticket_id=ticket_id, time_created=time_created)
+        for ticket_id, time_created in tickets.iterator()]
+    entries.extend(
+        models.FeedEntry(owner_id=user_id, review_id=review_id, time_created=time_created)
+        for review_id, time_created in reviews.iterator())
+    models.FeedEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def remove_follows(user_id, followed_user_ids):
+    # reviews written on the user's own tickets stay in their timeline
+    models.FeedEntry.objects.filter(owner_id=user_id).filter(
+        Q(ticket__user_id__in=followed_user_ids)
+        | Q(review__user_id__in=followed_user_ids) & ~Q(review__ticket__user_id=user_id)).delete()
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    followers = defaultdict(set)
+    for user_id, followed_user_id in models.UserFollows.objects.values_list('user_id', 'followed_user_id').iterator():
+        followers[followed_user_id].add(user_id)
+
+    models.FeedEntry.objects.all().delete()
+    entries = []
+    tickets = models.Ticket.objects.values_list('id', 'user_id', 'time_created')
+    for ticket_id, user_id, time_created in tickets.iterator():
+        for owner_id in {user_id} | followers[user_id]:
+            entries.append(models.FeedEntry(owner_id=owner_id, ticket_id=ticket_id, time_created=time_created))
+        if len(entries) >= batch_size:
+            models.FeedEntry.objects.bulk_create(entries)
+            entries = []
+    reviews = models.Review.objects.values_list('id', 'user_id', 'ticket__user_id', 'time_created')
+    for review_id, user_id, ticket_user_id, time_created in reviews.iterator():
+        for owner_id in {user_id, ticket_user_id} | followers[user_id]:
+            entries.append(models.FeedEntry(owner_id=owner_id, review_id=review_id, time_created=time_created))
+        if len(entries) >= batch_size:
+            models.FeedEntry.objects.bulk_create(entries)
+            entries = []
+    models.FeedEntry.objects.bulk_create(entries)
+    return models.FeedEntry.objects.count()
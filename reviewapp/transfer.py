@@ -0,0 +1,198 @@
+import csv
+import json
+from datetime import datetime
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from authentication.models import User
+from . import cache, models, ratings, timeline
+
+# columns of the exported posts, a ticket leaves the review columns empty and the other way round,
+# "ticket" is the id of the reviewed ticket in the same export
+FIELDS = [
+    "type", "id", "user", "time_created", "title", "description", "image", "ticket", "rating", "headline", "body"]
+TICKET_FIELDS = ["id", "user__username", "time_created", "title", "description", "image"]
+REVIEW_FIELDS = ["id", "user__username", "time_created", "ticket_id", "rating", "headline", "body"]
+BATCH_SIZE = 500
+
+
+class RecordError(Exception):
+    pass
+
+
+def get_format(path, file_format=None):
+    return file_format or ("csv" if str(path).lower().endswith(".csv") else "jsonl")
+
+
+def export_records():
+    # tickets first so that an import meets every ticket before its reviews, the iterators fetch the
+    # rows by chunks instead of loading the tables
+    tickets = models.Ticket.objects.order_by("id").values_list(*TICKET_FIELDS)
+    for ticket_id, username, time_created, title, description, image in tickets.iterator(chunk_size=BATCH_SIZE):
+        yield {"type": "ticket", "id": ticket_id, "user": username, "time_created": time_created.isoformat(),
+               "title": title, "description": description, "image": image or ""}
+    reviews = models.Review.objects.order_by("id").values_list(*REVIEW_FIELDS).iterator(chunk_size=BATCH_SIZE)
+    for review_id, username, time_created, ticket_id, rating, headline, body in reviews:
+        yield {"type": "review", "id": review_id, "user": username, "time_created": time_created.isoformat(),
+               "ticket": ticket_id, "rating": rating, "headline": headline, "body": body}
+
+
+def write_records(records, file, file_format):
+    if file_format == "csv":
+        writer = csv.DictWriter(file, FIELDS, restval="")
+        writer.writeheader()
+    count = 0
+    for record in records:
+        if file_format == "csv":
+            writer.writerow(record)
+        else:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def read_records(file, file_format):
+    # (line number, record) of every line, read one at a time
+    if file_format == "csv":
+        yield from enumerate(csv.DictReader(file), start=2)
+        return
+    for line_number, line in enumerate(file, start=1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as error:
+                yield line_number, {"error": str(error)}
+
+
+def batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Importer:
+    # imports tickets and reviews by batches, every batch in its own transaction, the source ids of the
+    # imported tickets are kept so that later reviews can refer to them
+
+    def __init__(self, image_dir=None, batch_size=BATCH_SIZE):
+        self.image_dir = Path(image_dir) if image_dir else None
+        self.batch_size = batch_size
+        self.ticket_ids = {}
+        # imported tickets only get the first of their reviews, as the database allows a single one
+        self.reviewed_ticket_ids = set()
+        self.imported = {"ticket": 0, "review": 0}
+        self.errors = []
+
+    def run(self, records, progress=None):
+        for batch in batches(records, self.batch_size):
+            self.import_batch(batch)
+            if progress:
+                progress(self.imported, self.errors)
+        return self.imported, self.errors
+
+    def store_image(self, name):
+        # images are either already stored or copied from the image directory, identical ones are stored once
+        if not name:
+            return None
+        if self.image_dir is None:
+            if not default_storage.exists(name):
+                raise RecordError(f"image introuvable : {name}")
+            return name
+        path = self.image_dir / name
+        if not path.is_file():
+            raise RecordError(f"image introuvable : {path}")
+        with path.open("rb") as file:
+            return default_storage.save(path.name, File(file))
+
+    def get_user(self, record, users):
+        user = users.get(record.get("user"))
+        if user is None:
+            raise RecordError(f"utilisateur inconnu : {record.get('user')}")
+        return user
+
+    def build_ticket(self, record, users):
+        ticket = models.Ticket(
+            title=record.get("title", ""), description=record.get("description") or "",
+            user=self.get_user(record, users))
+        ticket.time_created = parse_time(record)
+        ticket.clean_fields(exclude=["image", "user"])
+        ticket.image = self.store_image(record.get("image"))
+        return ticket
+
+    def build_review(self, record, users):
+        source_ticket_id = str(record.get("ticket"))
+        ticket_id = self.ticket_ids.get(source_ticket_id)
+        if ticket_id is None:
+            raise RecordError(f"ticket inconnu : {source_ticket_id}")
+        if ticket_id in self.reviewed_ticket_ids:
+            raise RecordError(f"le ticket {source_ticket_id} a déjà une critique")
+        review = models.Review(
+            ticket_id=ticket_id, rating=record.get("rating"), headline=record.get("headline", ""),
+            body=record.get("body") or "", user=self.get_user(record, users))
+        review.time_created = parse_time(record)
+        review.clean_fields(exclude=["ticket", "user"])
+        self.reviewed_ticket_ids.add(ticket_id)
+        return review
+
+    def build_posts(self, records, build, users):
+        # (record, post) of the valid records, the others are reported
+        posts = []
+        for line_number, record in records:
+            try:
+                posts.append((record, build(record, users)))
+            except (RecordError, ValidationError, ValueError) as error:
+                self.errors.append((line_number, error))
+        return posts
+
+    def import_batch(self, batch):
+        users = User.objects.in_bulk({record.get("user") for _, record in batch}, field_name="username")
+        records = {"ticket": [], "review": []}
+        for line_number, record in batch:
+            if "error" in record:
+                self.errors.append((line_number, RecordError(record["error"])))
+            elif record.get("type") not in records:
+                self.errors.append((line_number, RecordError(f"type inconnu : {record.get('type')}")))
+            else:
+                records[record["type"]].append((line_number, record))
+
+        built_tickets = self.build_posts(records["ticket"], self.build_ticket, users)
+        tickets = [ticket for _, ticket in built_tickets]
+        with transaction.atomic():
+            self.create(models.Ticket, tickets)
+            self.ticket_ids.update((str(record.get("id")), ticket.id) for record, ticket in built_tickets)
+            # built once the tickets of the batch have their ids
+            reviews = [review for _, review in self.build_posts(records["review"], self.build_review, users)]
+            self.create(models.Review, reviews)
+            # bulk_create sends no signal, the work of the post signals is done for the whole batch
+            owner_ids = timeline.fan_out(tickets, reviews)
+            ratings.reconcile(ticket_ids={review.ticket_id for review in reviews})
+        cache.invalidate_feeds(owner_ids)
+        self.imported["ticket"] += len(tickets)
+        self.imported["review"] += len(reviews)
+
+    def create(self, model, posts):
+        # auto_now_add overwrites the dates when inserting, the imported ones are restored afterwards
+        times = [post.time_created for post in posts]
+        model.objects.bulk_create(posts)
+        dated_posts = []
+        for post, time_created in zip(posts, times):
+            if time_created is not None:
+                post.time_created = time_created
+                dated_posts.append(post)
+        model.objects.bulk_update(dated_posts, ["time_created"])
+
+
+def parse_time(record):
+    time_created = datetime.fromisoformat(record["time_created"]) if record.get("time_created") else None
+    if time_created is not None and time_created.tzinfo is None:
+        raise ValueError(f"date sans fuseau horaire : {record['time_created']}")
+    return time_created
@@ -0,0 +1,48 @@
+import io
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image, ImageOps
+
+
+class OversizeUploadedFile(UploadedFile):
+    # stands for an upload dropped while streaming, only its size is kept for the form error
+    def __init__(self, name, content_type, size, charset):
+        super().__init__(io.BytesIO(), name, content_type, size, charset)
+
+
+class SizeLimitedUploadHandler(FileUploadHandler):
+    # first of FILE_UPLOAD_HANDLERS, stops passing the chunks of a file to the buffering handlers
+    # as soon as it exceeds IMAGE_UPLOAD_MAX_SIZE
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            return OversizeUploadedFile(self.file_name, self.content_type, file_size, self.charset)
+        return None
+
+
+def downscale(file, image_format, max_dimension):
+    # decodes at a reduced scale when the format allows it and spills the result to disk if large
+    with Image.open(file) as image:
+        image.draft(image.mode, (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        output = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        image.save(output, image_format, quality=settings.IMAGE_DOWNSCALE_QUALITY)
+    size = output.tell()
+    output.seek(0)
+    return output, size
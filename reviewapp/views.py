@@ -1,26 +1,14 @@
-import os
-from itertools import chain
-
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import CharField, Value
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 from django.views.generic import View
 
 from authentication.models import User
-from . import forms, models
-
-
-def get_user_tickets(user):
-    tickets = models.Ticket.objects.filter(user=user)
-    tickets = tickets.annotate(content_type=Value('TICKET', CharField()))
-    return tickets
-
-
-def get_user_reviews(user):
-    reviews = models.Review.objects.filter(user=user)
-    reviews = reviews.annotate(content_type=Value('REVIEW', CharField()))
-    return reviews
+from . import cache, feed, follows, forms, models, search
 
 
 def get_ticket_by_id(ticket_id):
@@ -33,38 +21,58 @@ def get_review_by_id(review_id):
     return review
 
 
+def render_feed_page(request, template_name, posts_template_name, page):
+    # the posts are rendered apart, with the Jinja2 templates when JINJA2_FEED is set, the page around them
+    # always with the Django ones
+    cache.render_snippets(page.posts, request.user)
+    posts_html = render_to_string(
+        posts_template_name, {"posts": page.posts, "next_cursor": page.next_cursor}, request,
+        using="jinja2" if settings.JINJA2_FEED else "django")
+    context = {
+        "posts_html": mark_safe(posts_html),
+        "since_cursor": page.since_cursor,
+        "poll_interval": settings.FEED_POLL_INTERVAL,
+        "stream_events": settings.ASYNC_VIEWS,
+    }
+    return render_to_string(template_name, context, request, using="django")
+
+
 class Home(LoginRequiredMixin, View):
     template_name = 'reviewapp/home.html'
+    posts_template_name = 'reviewapp/home_posts.html'
+
+    def render_page(self, request, cursor):
+        page = feed.timeline_feed(request.user, cursor)
+        return render_feed_page(request, self.template_name, self.posts_template_name, page)
 
     def get(self, request):
-        tickets = []
-        reviews = []
-        followed_user = models.UserFollows.objects.filter(user=request.user)
-        user_tickets = get_user_tickets(request.user)
-        tickets.extend(user_tickets)
-        user_reviews = get_user_reviews(request.user)
-        reviews.extend(user_reviews)
-        for ticket in user_tickets:
-            user_tickets_reviews = ticket.review_set.all()
-            user_tickets_reviews = user_tickets_reviews.annotate(content_type=Value('REVIEW', CharField()))
-            reviews.extend(user_tickets_reviews)
-        for user in followed_user:
-            followed_user_tickets = get_user_tickets(user.followed_user)
-            tickets.extend(followed_user_tickets)
-            followed_user_reviews = get_user_reviews(user.followed_user)
-            reviews.extend(followed_user_reviews)
-        all_posts = sorted(set(chain(tickets, reviews)), key=lambda instance: instance.time_created, reverse=True)
-        return render(request, self.template_name, context={"posts": all_posts})
+        cursor = request.GET.get("cursor")
+        content = cache.get_or_render_page("home", request.user, cursor, lambda: self.render_page(request, cursor))
+        return HttpResponse(content)
 
 
 class Posts(LoginRequiredMixin, View):
     template_name = 'reviewapp/posts.html'
+    posts_template_name = 'reviewapp/user_posts.html'
+
+    def render_page(self, request, cursor):
+        page = feed.user_posts(request.user, cursor)
+        return render_feed_page(request, self.template_name, self.posts_template_name, page)
+
+    def get(self, request):
+        cursor = request.GET.get("cursor")
+        content = cache.get_or_render_page("posts", request.user, cursor, lambda: self.render_page(request, cursor))
+        return HttpResponse(content)
+
+
+class SearchView(LoginRequiredMixin, View):
+    template_name = 'reviewapp/search.html'
 
     def get(self, request):
-        tickets = get_user_tickets(request.user)
-        reviews = get_user_reviews(request.user)
-        all_posts = sorted(chain(tickets, reviews), key=lambda instance: instance.time_created, reverse=True)
-        return render(request, self.template_name, context={"posts": all_posts})
+        text = request.GET.get("q", "")
+        page_number = request.GET.get("page", "1")
+        page = search.search_posts(text, int(page_number) if page_number.isdigit() else 1)
+        return render(request, self.template_name, context={"q": text, "page": page})
 
 
 class TicketCreationView(LoginRequiredMixin, View):
@@ -96,14 +104,19 @@ class ReviewCreationView(LoginRequiredMixin, View):
 
     def post(self, request, ticket_id):
         ticket = get_ticket_by_id(ticket_id)
-        has_review = models.Review.objects.filter(ticket=ticket).exists()
         form = self.form_class(request.POST)
-        if form.is_valid() and not has_review:
+        if form.is_valid():
             review = form.save(commit=False)
             review.ticket = ticket
             review.user = request.user
-            review.save()
-            return redirect('home')
+            # the unique constraint on the ticket rejects the insert when the ticket already has a review
+            try:
+                with transaction.atomic():
+                    review.save()
+            except IntegrityError:
+                form.add_error(None, "Ce ticket a déjà une critique.")
+            else:
+                return redirect('home')
         return render(request, self.template_name, context={"ticket": ticket, "form": form})
 
 
@@ -155,12 +168,9 @@ class UpdateTicketView(LoginRequiredMixin, View):
                 form = self.ticket_form_class(request.POST, request.FILES, instance=ticket)
             if form.is_valid():
                 updated_ticket = form.save(commit=False)
-                if old_image:
-                    if "image-clear" in request.POST:
-                        os.remove(old_image.path)
-                        updated_ticket.image = ""
-                    elif 'image' in form.files and form.files["image"] != old_image:
-                        os.remove(old_image.path)
+                # replaced images are left to the collect_media command, other tickets may share them
+                if old_image and "image-clear" in request.POST:
+                    updated_ticket.image = ""
                 updated_ticket.save()
                 return redirect('posts')
             return render(request, self.template_name, context={'form': form, "is_ticket": True})
@@ -200,8 +210,6 @@ class DeleteTicketView(LoginRequiredMixin, View):
     def post(self, request, ticket_id):
         ticket = get_ticket_by_id(ticket_id)
         if request.user == ticket.user:
-            if ticket.image:
-                os.remove(ticket.image.path)
             ticket.delete()
             return redirect('posts')
         message = "Vous n'avez pas les droits pour supprimer ce ticket."
@@ -224,42 +232,35 @@ class DeleteReviewView(LoginRequiredMixin, View):
         return render(request, self.template_name, context={"review": review, "message": message})
 
 
+def parse_usernames(value):
+    # several usernames may be given at once, separated by commas or spaces
+    return set(value.replace(",", " ").split())
+
+
+def follow_messages(user, usernames, already_followed, unknown):
+    messages = []
+    if user.username in usernames:
+        messages.append("Vous ne pouvez pas vous abonner à vous-même.")
+    if unknown:
+        messages.append("Merci de saisir un utilisateur correct.")
+    if already_followed:
+        messages.append(f"Vous suivez déjà {', '.join(already_followed)}.")
+    return " ".join(messages)
+
+
 class FollowerAddView(LoginRequiredMixin, View):
     template_name = 'reviewapp/add_followers.html'
 
-    def follows(self, user):
-        subscriptions = models.UserFollows.objects.filter(user=user)
-        subscribers = models.UserFollows.objects.filter(followed_user=user)
-        return {"subscriptions": subscriptions, "subscribers": subscribers}
-
     def get(self, request):
-        users_links = self.follows(request.user)
-        return render(request, self.template_name, context={
-            "subscriptions": users_links["subscriptions"],
-            "subscribers": users_links["subscribers"]})
+        return render(request, self.template_name, context=follows.get_follows(request.user))
 
     def post(self, request):
-        users_links = self.follows(request.user)
-        if request.POST.get("username") == request.user.username:
-            message = "Vous ne pouvez pas vous abonner à vous-même."
-        else:
-            try:
-                selected_user = User.objects.get(username=request.POST.get("username"))
-                subscription = models.UserFollows.objects\
-                    .filter(user=request.user, followed_user=selected_user)\
-                    .exists()
-                if not subscription and selected_user != request.user:
-                    new_user_link = models.UserFollows(user=request.user, followed_user=selected_user)
-                    new_user_link.save()
-                    return redirect("add-follower")
-                else:
-                    message = f"Vous suivez déjà {selected_user}."
-            except ObjectDoesNotExist:
-                message = "Merci de saisir un utilisateur correct."
-        return render(request, self.template_name, context={
-            "message": message,
-            "subscriptions": users_links["subscriptions"],
-            "subscribers": users_links["subscribers"]})
+        usernames = parse_usernames(request.POST.get("username", ""))
+        _, already_followed, unknown = follows.follow(request.user, usernames)
+        message = follow_messages(request.user, usernames, already_followed, unknown)
+        if not message:
+            return redirect("add-follower")
+        return render(request, self.template_name, context={"message": message, **follows.get_follows(request.user)})
 
 
 class DeleteFollowerView(LoginRequiredMixin, View):
@@ -270,10 +271,16 @@ class DeleteFollowerView(LoginRequiredMixin, View):
         return render(request, self.template_name, context={"followed_user": followed_user})
 
     def post(self, request, follower_id):
-        followed_user = User.objects.get(id=follower_id)
-        users_link = models.UserFollows.objects.filter(user=request.user, followed_user=followed_user).exists()
-        if users_link:
-            models.UserFollows.objects.get(user=request.user, followed_user=followed_user).delete()
+        if follows.unfollow(request.user, [follower_id]):
             return redirect('add-follower')
+        followed_user = User.objects.get(id=follower_id)
         message = "Vous n'êtes pas abonné à cet utilisateur."
         return render(request, self.template_name, context={"followed_user": followed_user, "message": message})
+
+
+class DeleteFollowersView(LoginRequiredMixin, View):
+    # unfollows the users checked in the subscriptions list
+    def post(self, request):
+        user_ids = [int(user_id) for user_id in request.POST.getlist("user_id") if user_id.isdigit()]
+        follows.unfollow(request.user, user_ids)
+        return redirect('add-follower')